@@ -0,0 +1,58 @@
+"""Service query indexes
+
+Revision ID: 5b0e7c2f93d1
+Revises: a46cd22a2de6
+Create Date: 2026-10-18 14:12:40.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0e7c2f93d1'
+down_revision: Union[str, None] = 'a46cd22a2de6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# messages.conversation_id is already covered by ix_messages_conversation_id_id
+INDEXES = [
+    ('ix_conversations_user_id_created_at', 'conversations', ['user_id', 'created_at']),
+    ('ix_subscriptions_user_id_status_created_at', 'subscriptions', ['user_id', 'status', 'created_at']),
+    ('ix_payments_user_id', 'payments', ['user_id']),
+    ('ix_payments_subscription_id', 'payments', ['subscription_id']),
+    ('ix_agents_link', 'agents', ['link']),
+]
+
+
+def _is_invalid(name: str) -> bool:
+    """A failed CREATE INDEX CONCURRENTLY leaves the index behind, marked INVALID and never used."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    row = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    return row is not None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY does not lock out writes but cannot run inside a transaction.
+    # if_not_exists lets a rerun pick up after a partial failure; drop any INVALID index it left first.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if _is_invalid(name):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(name, table, columns, unique=False, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""Messages conversation keyset index
+
+Revision ID: 90ccd694a266
+Revises: dc91b5e36033
+Create Date: 2026-10-18 10:03:17.208455
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '90ccd694a266'
+down_revision: Union[str, None] = 'dc91b5e36033'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_conversation_id_id', 'messages', ['conversation_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id_id', table_name='messages')
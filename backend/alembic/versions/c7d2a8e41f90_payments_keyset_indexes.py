@@ -0,0 +1,39 @@
+"""Payments keyset indexes
+
+Revision ID: c7d2a8e41f90
+Revises: e1f4a9c07b52
+Create Date: 2026-10-18 19:48:05.412377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2a8e41f90'
+down_revision: Union[str, None] = 'e1f4a9c07b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The payment lists page by id within a user / subscription; a single-column index
+# cannot give that order, so the planner walked the whole primary key instead
+REPLACED = [
+    ('ix_payments_user_id', 'ix_payments_user_id_id', ['user_id']),
+    ('ix_payments_subscription_id', 'ix_payments_subscription_id_id', ['subscription_id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for old_name, new_name, columns in REPLACED:
+            op.create_index(new_name, 'payments', columns + ['id'], unique=False, if_not_exists=True, postgresql_concurrently=True)
+            op.drop_index(old_name, table_name='payments', if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for old_name, new_name, columns in reversed(REPLACED):
+            op.create_index(old_name, 'payments', columns, unique=False, if_not_exists=True, postgresql_concurrently=True)
+            op.drop_index(new_name, table_name='payments', if_exists=True, postgresql_concurrently=True)
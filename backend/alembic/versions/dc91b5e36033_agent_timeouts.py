@@ -0,0 +1,30 @@
+"""Agent timeouts
+
+Revision ID: dc91b5e36033
+Revises: 9f4df3c3f1de
+Create Date: 2026-10-18 09:12:41.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dc91b5e36033'
+down_revision: Union[str, None] = '9f4df3c3f1de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('agents', sa.Column('connect_timeout', sa.Float(), nullable=True))
+    op.add_column('agents', sa.Column('read_timeout', sa.Float(), nullable=True))
+    op.add_column('agents', sa.Column('total_timeout', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('agents', 'total_timeout')
+    op.drop_column('agents', 'read_timeout')
+    op.drop_column('agents', 'connect_timeout')
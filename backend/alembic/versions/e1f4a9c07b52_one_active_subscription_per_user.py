@@ -0,0 +1,48 @@
+"""One active subscription per user
+
+Revision ID: e1f4a9c07b52
+Revises: 5b0e7c2f93d1
+Create Date: 2026-10-18 15:02:11.734918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f4a9c07b52'
+down_revision: Union[str, None] = '5b0e7c2f93d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Users with several active subscriptions keep the newest one active, as the old lookup did
+    op.execute("""
+        UPDATE subscriptions SET status = 'inactive'
+        WHERE status = 'active'
+          AND EXISTS (
+              SELECT 1 FROM subscriptions newer
+              WHERE newer.user_id = subscriptions.user_id
+                AND newer.status = 'active'
+                AND newer.id > subscriptions.id
+          )
+    """)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_subscriptions_user_id_active',
+            'subscriptions',
+            ['user_id'],
+            unique=True,
+            if_not_exists=True,
+            postgresql_where=sa.text("status = 'active'"),
+            sqlite_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_subscriptions_user_id_active', table_name='subscriptions', if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import agent_calls, agent_latency
+from app.db.models import Agent
+
+class AgentClient:
+    """
+    Application-wide httpx client for the n8n agent webhooks.
+    Created once in the FastAPI lifespan so connections are kept alive and reused.
+    """
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.host_busy: Dict[str, int] = {}
+        self.host_waiting: Dict[str, int] = {}
+        self.host_idle: Dict[str, List[float]] = {}  # When each slot believed to hold a kept-alive connection was released
+        self.in_flight = 0
+        self.waiting = 0
+
+    def start(self):
+        if self.client is not None:
+            return
+        http2 = settings.AGENT_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("[agent_client] h2 is not installed, falling back to HTTP/1.1")
+                http2 = False
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.AGENT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AGENT_MAX_KEEPALIVE,
+                keepalive_expiry=settings.AGENT_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.AGENT_READ_TIMEOUT, connect=settings.AGENT_CONNECT_TIMEOUT),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _timeouts(self, agent: Optional[Agent]):
+        connect = settings.AGENT_CONNECT_TIMEOUT
+        read = settings.AGENT_READ_TIMEOUT
+        total = settings.AGENT_TOTAL_TIMEOUT
+        if agent is not None:
+            connect = agent.connect_timeout or connect
+            read = agent.read_timeout or read
+            total = agent.total_timeout or total
+        return httpx.Timeout(read, connect=connect), total
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        host = urlsplit(url).netloc
+        if host not in self.host_slots:
+            self.host_slots[host] = asyncio.Semaphore(settings.AGENT_MAX_CONNECTIONS_PER_HOST)
+            self.host_busy[host] = 0
+            self.host_waiting[host] = 0
+            self.host_idle[host] = []
+        slot = self.host_slots[host]
+        if slot.locked():
+            self.waiting += 1
+            self.host_waiting[host] += 1
+            try:
+                await slot.acquire()
+            finally:
+                self.waiting -= 1
+                self.host_waiting[host] -= 1
+        else:
+            await slot.acquire()
+        idle = self.host_idle[host]
+        if idle:
+            idle.pop()  # httpx hands out a kept-alive connection before opening one
+        self.in_flight += 1
+        self.host_busy[host] += 1
+        try:
+            yield
+        except BaseException:
+            raise  # httpx closes the connection of a failed or cancelled request
+        else:
+            idle.append(time.monotonic())
+        finally:
+            self.in_flight -= 1
+            self.host_busy[host] -= 1
+            slot.release()
+
+    @asynccontextmanager
+    async def _measured(self, agent: Optional[Agent]):
+        """Records latency and outcome per agent link; links that are not a known agent share one series."""
+        outcome = {"status": "error"}
+        started = time.perf_counter()
+        try:
+            yield outcome
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            outcome["status"] = "timeout"
+            raise
+        finally:
+            link = agent.link if agent is not None and agent.link else "(unknown)"
+            agent_calls.inc((link, outcome["status"]))
+            agent_latency.observe((link,), time.perf_counter() - started)
+
+    async def post(self, url: str, payload: dict, agent: Optional[Agent] = None) -> httpx.Response:
+        if self.client is None:
+            self.start()
+        timeout, total = self._timeouts(agent)
+        async with self._host_slot(url):
+            async with self._measured(agent) as outcome:
+                response = await asyncio.wait_for(self.client.post(url, json=payload, timeout=timeout), total)
+                outcome["status"] = str(response.status_code)
+                return response
+
+    async def stream(self, url: str, payload: dict, agent: Optional[Agent] = None) -> AsyncIterator[str]:
+        """
+        Posts to the agent and yields the reply text as it arrives.
+        Understands SSE and NDJSON bodies; anything else is passed through as raw text chunks.
+        The total timeout covers the whole reply, including stalls and keep-alives between deltas.
+        """
+        if self.client is None:
+            self.start()
+        timeout, total = self._timeouts(agent)
+        deadline = asyncio.get_running_loop().time() + total
+        async with self._host_slot(url), self._measured(agent) as outcome:
+            request = self.client.build_request("POST", url, json=payload, timeout=timeout)
+            # Each await is bounded on its own: a timeout scope must not span a yield,
+            # or it would cancel whatever the caller is doing with the previous delta
+            async with asyncio.timeout_at(deadline):
+                response = await self.client.send(request, stream=True)
+            try:
+                outcome["status"] = str(response.status_code)
+                content_type = response.headers.get("content-type", "")
+                if "text/event-stream" in content_type:
+                    chunks = _sse_deltas(response)
+                elif "ndjson" in content_type or "jsonl" in content_type:
+                    chunks = _ndjson_deltas(response)
+                else:
+                    chunks = response.aiter_text()
+                while True:
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            delta = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    if delta:
+                        yield delta
+            finally:
+                await response.aclose()
+
+    def _idle(self, host: str) -> int:
+        expired = time.monotonic() - settings.AGENT_KEEPALIVE_EXPIRY
+        idle = self.host_idle[host]
+        idle[:] = [released for released in idle if released > expired]
+        return len(idle)
+
+    def stats(self) -> dict:
+        """
+        Counts from our own per-host slots only, not from httpx's private pool.
+        "in use" holds a slot (it may still be queued inside httpx when AGENT_MAX_CONNECTIONS
+        is below the sum of the per-host limits); "waiting" is blocked on a slot.
+        "idle" is an estimate: requests that completed within AGENT_KEEPALIVE_EXPIRY and whose
+        connection no later request has reused, capped at AGENT_MAX_KEEPALIVE. A connection the
+        agent closes early still counts until it expires; over HTTP/2 it counts streams, not connections.
+        """
+        idle = {host: self._idle(host) for host in self.host_idle}
+        return {
+            "max_connections": settings.AGENT_MAX_CONNECTIONS,
+            "in_use": self.in_flight,
+            "idle": min(sum(idle.values()), settings.AGENT_MAX_KEEPALIVE),
+            "waiting": self.waiting,
+            "hosts": {
+                host: {
+                    "limit": settings.AGENT_MAX_CONNECTIONS_PER_HOST,
+                    "in_use": busy,
+                    "idle": idle[host],
+                    "waiting": self.host_waiting[host],
+                }
+                for host, busy in self.host_busy.items()
+            },
+        }
+
+def _json_delta(data: str) -> Optional[str]:
+    try:
+        event = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(event, str):
+        return event
+    if not isinstance(event, dict) or event.get("type") in ("begin", "end", "error"):
+        return None
+    for key in ("content", "delta", "text", "output"):
+        if isinstance(event.get(key), str):
+            return event[key]
+    return None
+
+async def _sse_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        yield _json_delta(data)
+
+async def _ndjson_deltas(response: httpx.Response) -> AsyncIterator[str]:
+    async for line in response.aiter_lines():
+        if line.strip():
+            yield _json_delta(line)
+
+agent_client = AgentClient()
@@ -0,0 +1,119 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List
+
+from app.core.config import settings
+
+Job = Callable[[], Awaitable[None]]
+
+class AgentQueueFull(Exception):
+    pass
+
+class Reservation:
+    """
+    A queue slot held while a request persists what its job needs.
+    submit() fills the slot; release() gives it back if the request fails first.
+    """
+
+    def __init__(self, queue: "AgentReplyQueue"):
+        self.queue = queue
+        self.held = True
+
+    def submit(self, agent_key: str, job: Job):
+        self.release()
+        self.queue._enqueue(agent_key, job)
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.queue.reserved -= 1
+
+class AgentReplyQueue:
+    """
+    In-process work queue for agent replies.
+
+    Jobs are grouped by agent (its webhook link) and workers pick agents
+    round-robin, so one busy agent cannot starve the others.
+    """
+
+    def __init__(self, concurrency: int, max_depth: int):
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.pending: Dict[str, Deque[Job]] = {}
+        self.ready: Deque[str] = deque()  # Agents with pending jobs, in serving order
+        self.depth = 0
+        self.reserved = 0  # Slots held by requests that have not submitted yet
+        self.running = 0
+        self._available = asyncio.Semaphore(0)
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _check_room(self):
+        if self.depth + self.reserved >= self.max_depth:
+            raise AgentQueueFull(f"Agent reply queue is full ({self.max_depth} pending)")
+
+    def reserve(self) -> Reservation:
+        """Holds a slot for a job submitted later; raises AgentQueueFull when there is none."""
+        self._check_room()
+        self.reserved += 1
+        return Reservation(self)
+
+    def submit(self, agent_key: str, job: Job):
+        self._check_room()
+        self._enqueue(agent_key, job)
+
+    def _enqueue(self, agent_key: str, job: Job):
+        if agent_key not in self.pending:
+            self.pending[agent_key] = deque()
+            self.ready.append(agent_key)
+        self.pending[agent_key].append(job)
+        self.depth += 1
+        self._available.release()
+
+    def _next_job(self) -> Job:
+        agent_key = self.ready.popleft()
+        jobs = self.pending[agent_key]
+        job = jobs.popleft()
+        if jobs:
+            self.ready.append(agent_key)  # Back of the line, behind the other agents
+        else:
+            del self.pending[agent_key]
+        self.depth -= 1
+        return job
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            self.running += 1
+            try:
+                await job()
+            except Exception as exc:
+                print(f"[agent_queue] Agent reply failed: {exc!r}")
+            finally:
+                self.running -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_depth": self.max_depth,
+            "depth": self.depth,
+            "reserved": self.reserved,
+            "running": self.running,
+            "agents_waiting": len(self.pending),
+        }
+
+agent_queue = AgentReplyQueue(
+    concurrency=settings.AGENT_QUEUE_CONCURRENCY,
+    max_depth=settings.AGENT_QUEUE_MAX_DEPTH,
+)
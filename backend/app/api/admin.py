@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.schemas.user import User
+from app.api.auth import get_current_user
+from app.agent_client import agent_client
+from app.agent_queue import agent_queue
+from app.websocket_manager import ws_manager
+from app.db.database import engine, async_engine, replica_engine, replica_health, POOL_MAX_OVERFLOW
+from app.db.pool_metrics import pool_stats
+from app.core.auth_cache import principal_cache, token_cache
+from app.core.password_hasher import password_hasher
+from app.core.compression import compression_stats
+
+router = APIRouter()
+
+@router.get("/admin/agent-pool")
+def get_agent_pool_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return {"http": agent_client.stats(), "queue": agent_queue.stats()}
+
+@router.get("/admin/ws-stats")
+def get_ws_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return ws_manager.get_stats()
+
+@router.get("/admin/db-pool")
+def get_db_pool_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    stats = {
+        "sync": pool_stats(engine.pool, POOL_MAX_OVERFLOW[engine]),
+        "async": pool_stats(async_engine.pool, POOL_MAX_OVERFLOW[async_engine]),
+    }
+    if replica_engine is not None:
+        stats["replica"] = {
+            **pool_stats(replica_engine.pool, POOL_MAX_OVERFLOW[replica_engine]),
+            "routing": replica_health.stats(),
+        }
+    return stats
+
+@router.get("/admin/auth-cache")
+def get_auth_cache_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return {"principals": principal_cache.stats(), "tokens": token_cache.stats()}
+
+@router.get("/admin/password-hasher")
+def get_password_hasher_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return password_hasher.stats()
+
+@router.get("/admin/compression")
+def get_compression_stats(current_user: User = Depends(get_current_user)):
+    if current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return compression_stats.as_dict()
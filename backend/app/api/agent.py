@@ -1,34 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.agent import Agent, AgentCreate, AgentUpdate
 from typing import Optional
-from app.services.agent_service import AgentService
-from app.db.database import get_db
+from app.services.agent_service import AgentService, AsyncAgentService
+from app.db.database import get_db, get_read_db, get_async_db, SessionLocal
+from app.core.catalog import catalog_snapshot, catalog_response
 from app.schemas.user import User  # Import User schema if needed for authentication
 from app.api.auth import get_current_user  # Import the dependency to get the current user
 from fastapi import File, UploadFile, Form
+from app.core.storage import save_upload
 import os
 import json
-from uuid import uuid4
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "../uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 router = APIRouter()
 
+def _load_agents(active_only: bool):
+    # From the primary: a lagging replica would keep the old catalog cached
+    with SessionLocal() as db:
+        service = AgentService(db)
+        return service.get_active_agents() if active_only else service.get_agents()
+
 @router.get("/agents", response_model=list[Agent])
-def get_agents(db: Session = Depends(get_db)):
-    service = AgentService(db)
-    return service.get_agents()
+def get_agents(request: Request):
+    snapshot = catalog_snapshot("agents", Agent, lambda: _load_agents(active_only=False))
+    return catalog_response(request, snapshot)
 
 @router.get("/agents/active", response_model=list[Agent])
-def get_active_agents(db: Session = Depends(get_db)):
-    service = AgentService(db)
-    return service.get_active_agents()
+def get_active_agents(request: Request):
+    snapshot = catalog_snapshot("agents_active", Agent, lambda: _load_agents(active_only=True))
+    return catalog_response(request, snapshot)
     
 
 @router.get("/agents/{agent_id}", response_model=Agent)
-def get_agent(agent_id: int, db: Session = Depends(get_db)):
+def get_agent(agent_id: int, db: Session = Depends(get_read_db)):
     service = AgentService(db)
     agent = service.get_agent(agent_id)
     if not agent:
@@ -45,7 +53,10 @@ async def create_agent(
     image: UploadFile = File(None),
     eleven_labs_id: Optional[str] = Form(None),
     link: Optional[str]=Form(None),
-    db: Session = Depends(get_db),
+    connect_timeout: Optional[float] = Form(None),
+    read_timeout: Optional[float] = Form(None),
+    total_timeout: Optional[float] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.type != "admin":
@@ -56,7 +67,10 @@ async def create_agent(
         "description": description,
         "is_active": is_active,
         "eleven_labs_id": eleven_labs_id,
-        "link":link
+        "link":link,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+        "total_timeout": total_timeout,
     }
     # Handle feature_list if provided as JSON string
     if feature_list:
@@ -66,16 +80,10 @@ async def create_agent(
 
     # Handle image upload
     if image:
-        UPLOAD_DIR = "uploads/plans"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{image.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f_out:
-            f_out.write(await image.read())
-        agent_data["image_path"]  = f"{UPLOAD_DIR}/{filename}"
+        agent_data["image_path"] = (await save_upload(image, "plans", db)).path
 
-    service = AgentService(db)
-    return service.create_agent(agent_data)
+    service = AsyncAgentService(db)
+    return await service.create_agent(agent_data)
 
 
 @router.put("/agents/{agent_id}", response_model=Agent)
@@ -89,13 +97,16 @@ async def update_agent(
     feature_list: Optional[str] = Form(None),  # Accept as JSON string if needed
     is_active: Optional[bool] = Form(None),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    connect_timeout: Optional[float] = Form(None),
+    read_timeout: Optional[float] = Form(None),
+    total_timeout: Optional[float] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
-    service = AgentService(db)
-    agent = service.get_agent(agent_id)
+    service = AsyncAgentService(db)
+    agent = await service.get_agent(agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     agent_update = {}
@@ -113,15 +124,15 @@ async def update_agent(
         agent_update["eleven_labs_id"] = eleven_labs_id
     if link is not None:
         agent_update["link"] = link
+    if connect_timeout is not None:
+        agent_update["connect_timeout"] = connect_timeout
+    if read_timeout is not None:
+        agent_update["read_timeout"] = read_timeout
+    if total_timeout is not None:
+        agent_update["total_timeout"] = total_timeout
     if image:
-        UPLOAD_DIR = "uploads/plans"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{image.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await image.read())
-        agent_update["image_path"] = f"{UPLOAD_DIR}/{filename}"
-    return service.update_agent(agent, agent_update)
+        agent_update["image_path"] = (await save_upload(image, "plans", db)).path
+    return await service.update_agent(agent, agent_update)
 
         
 
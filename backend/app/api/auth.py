@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status,  UploadFile, File, Form
 from sqlalchemy.orm import Session
-from app.services.user_service import UserService
-from app.db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.user_service import UserService, AsyncUserService
+from app.db.database import get_db, get_async_db, SessionLocal
 from app.schemas.user import UserCreate, User, UserUpdate, ChangePassword, UserWithToken
 from jose import jwt, JWTError
 from datetime import timedelta, datetime
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi import Body
+from app.core.storage import save_upload
+from app.core.auth_cache import principal_cache, decode_token
+from app.core.password_hasher import HasherBusy
+from fastapi.responses import JSONResponse
+from app.core.ndjson import AFTER, LIMIT, FORMAT, ndjson_response
+from typing import Optional
 
 import os
-from uuid import uuid4
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "../uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -21,6 +27,14 @@ router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+async def hasher_busy_handler(request, exc: HasherBusy):
+    """Registered in app.main: a full password hashing pool is a 503, not a 500."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-ins in progress, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=401,
@@ -28,27 +42,39 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token, SECRET_KEY, ALGORITHM)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    service = UserService(db)
-    user = service.get_user_by_email(email)
-    if user is None:
+    user = principal_cache.get(email)
+    if user is not None:
+        return user
+    generation = principal_cache.generation
+    db_user = UserService(db).get_user_by_email(email)
+    if db_user is None:
         raise credentials_exception
+    # A detached snapshot, safe to share between requests and sessions
+    user = User.model_validate(db_user, from_attributes=True)
+    principal_cache.set(email, user, generation=generation)
     return user
 
 @router.get("/users", response_model=list[User])
-def get_users(db: Session = Depends(get_db)):
+def get_users(after: Optional[int] = AFTER, limit: int = LIMIT, output: str = FORMAT, db: Session = Depends(get_db)):
+    if output == "ndjson":
+        return ndjson_response(SessionLocal, lambda stream_db: UserService(stream_db).users_query(after=after), User)
     service = UserService(db)
-    return service.get_users()
+    return service.get_users(after=after, limit=limit)
 
 @router.get("/users/active", response_model=list[User])
-def get_active_users(db: Session = Depends(get_db)):
+def get_active_users(after: Optional[int] = AFTER, limit: int = LIMIT, output: str = FORMAT, db: Session = Depends(get_db)):
+    if output == "ndjson":
+        return ndjson_response(
+            SessionLocal, lambda stream_db: UserService(stream_db).users_query(active_only=True, after=after), User
+        )
     service = UserService(db)
-    return service.get_active_users()
+    return service.get_active_users(after=after, limit=limit)
 
 @router.get("/users/{user_id}", response_model=User)
 def get_user(user_id: int, db: Session = Depends(get_db)):
@@ -68,25 +94,19 @@ async def signup(
     email_template: str = Form(None),
     bio: str = Form(None),
     profile_picture: UploadFile = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    service = UserService(db)
-    db_user = service.get_user_by_email(email)
+    service = AsyncUserService(db)
+    db_user = await service.get_user_by_email(email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     profile_picture_path = None
     if profile_picture:
-        UPLOAD_DIR = "uploads/profiles"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{profile_picture.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await profile_picture.read())
-        profile_picture_path = f"{UPLOAD_DIR}/{filename}"
+        profile_picture_path = (await save_upload(profile_picture, "profiles", db)).path
 
 
-    return service.create_user(
+    return await service.create_user(
         email,
         password,
         first_name=first_name,
@@ -108,11 +128,11 @@ async def create_user_admin(
     email_template: str = Form(None),
     bio: str = Form(None),
     profile_picture: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)  # Only admins can access
 ):
-    service = UserService(db)
-    db_user = service.get_user_by_email(email)
+    service = AsyncUserService(db)
+    db_user = await service.get_user_by_email(email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     # Only allow if current user is an admin
@@ -121,15 +141,9 @@ async def create_user_admin(
     
     profile_picture_path = None
     if profile_picture:
-        UPLOAD_DIR = "uploads/profiles"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{profile_picture.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await profile_picture.read())
-        profile_picture_path = f"{UPLOAD_DIR}/{filename}"
-
-    return service.create_user(
+        profile_picture_path = (await save_upload(profile_picture, "profiles", db)).path
+
+    return await service.create_user(
         email,
         password,
         first_name=first_name,
@@ -141,9 +155,9 @@ async def create_user_admin(
         bio=bio,
     )
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    service = UserService(db)
-    user = service.authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    service = AsyncUserService(db)
+    user = await service.authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     token_data = {"sub": user.email, "exp": datetime.utcnow() + timedelta(hours=24)}
@@ -153,24 +167,24 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 # Logout is handled on the frontend by deleting the JWT token
 
 @router.post("/change-password")
-def change_password(
+async def change_password(
     change: ChangePassword,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    service = UserService(db)
+    service = AsyncUserService(db)
     # If admin and email is provided, change that user's password
     if current_user.type == "admin" and change.email:
-        user = service.get_user_by_email(change.email)
+        user = await service.get_user_by_email(change.email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        service.change_password(user, change.new_password)
+        await service.change_password(user, change.new_password)
         return {"msg": f"Password updated for {change.email}"}
     else:
-        user = service.get_user_by_email(current_user.email)
-        if not user or not service.authenticate_user(current_user.email, change.old_password):
+        user = await service.authenticate_user(current_user.email, change.old_password)
+        if not user:
             raise HTTPException(status_code=400, detail="Incorrect email or password")
-        service.change_password(current_user, change.new_password)
+        await service.change_password(user, change.new_password)
         return {"msg": "Password updated"}
 
 @router.patch("/update-profile", response_model=UserWithToken)
@@ -182,11 +196,11 @@ async def update_profile(
     bio: str = Form(None),
     profile_picture: UploadFile = File(None),
     is_active: bool = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    service = UserService(db)
-    user = service.get_user_by_email(current_user.email)
+    service = AsyncUserService(db)
+    user = await service.get_user_by_email(current_user.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     update_data = {}
@@ -203,18 +217,9 @@ async def update_profile(
     if bio is not None:
         update_data["bio"] = bio
     if profile_picture:
-        UPLOAD_DIR = "uploads/profiles"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        # Save the profile picture with a unique filename
-        filename = f"{uuid4()}_{profile_picture.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await profile_picture.read())
-        update_data["profile_picture_path"] = f"{UPLOAD_DIR}/{filename}"
+        update_data["profile_picture_path"] = (await save_upload(profile_picture, "profiles", db)).path
     
-    updated_user= service.update_profile(user, **update_data)
-    print(updated_user.email_template)
-    print(updated_user.bio)
+    updated_user= await service.update_profile(user, **update_data)
 
     if not updated_user:
         raise HTTPException(status_code=400, detail="Failed to update profile") 
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from app.schemas.conversation import Conversation, ConversationCreate, ConversationUpdate
+from app.schemas.conversation import Conversation, ConversationCreate, ConversationUpdate, ConversationSummary
 from app.services.conversation_service import ConversationService
 from app.schemas.user import User
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db, ReadSessionLocal, SessionLocal
+from app.core.ndjson import AFTER, LIMIT, FORMAT, ndjson_response
 
 from app.api.auth import get_current_user  # Import the dependency to get the current user
 
 router = APIRouter()
 
 @router.get("/conversations", response_model=list[Conversation])
-def get_conversations(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_conversations(
+    after: Optional[int] = AFTER,
+    limit: int = LIMIT,
+    output: str = FORMAT,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
+    if output == "ndjson":
+        # Bulk export, read from the replica when there is one
+        return ndjson_response(
+            ReadSessionLocal or SessionLocal,
+            lambda stream_db: ConversationService(stream_db).conversations_query(after=after),
+            Conversation,
+        )
     service = ConversationService(db)
-    return service.get_conversations()
+    return service.get_conversations(after=after, limit=limit)
 
 @router.get("/users/{user_id}/conversations", response_model=list[Conversation])
 def get_conversations_by_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.id != user_id and current_user.type != "admin":
@@ -27,11 +43,27 @@ def get_conversations_by_user(
     service = ConversationService(db)
     return service.get_conversations_by_user(user_id)
 
+@router.get("/users/{user_id}/inbox", response_model=list[ConversationSummary])
+def get_inbox(
+    user_id: int,
+    before_activity: Optional[datetime] = Query(None, description="last_activity_at of the last row of the previous page"),
+    before_id: Optional[int] = Query(None, description="id of the last row of the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.id != user_id and current_user.type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view these conversations")
+    if (before_activity is None) != (before_id is None):
+        raise HTTPException(status_code=422, detail="before_activity and before_id must be given together")
+    service = ConversationService(db)
+    return service.get_inbox(user_id, before_activity=before_activity, before_id=before_id, limit=limit)
+
 @router.get("/users/{user_id}/conversations/{conversation_id}", response_model=Conversation)
 def get_conversation(
     user_id: int,
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     service = ConversationService(db)
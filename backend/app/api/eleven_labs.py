@@ -1,6 +1,6 @@
 import json
 from fastapi import FastAPI, Request, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 from pydantic import BaseModel
 import hmac
@@ -9,8 +9,8 @@ import time
 import os
 from fastapi import APIRouter
 from app.websocket_manager import ws_manager    # Import the WebSocket manager
-from app.services.eleven_labs import ElevenLabsService
-from app.db.database import get_db
+from app.services.eleven_labs import AsyncElevenLabsService
+from app.db.database import get_async_db
 
 router = APIRouter()
 # Load environment variables
@@ -24,7 +24,7 @@ class WebhookPayload(BaseModel):
 
 
 @router.post("/webhook/eleven")
-async def receive_webhook(request: Request,db: Session = Depends(get_db)):
+async def receive_webhook(request: Request,db: AsyncSession = Depends(get_async_db)):
     print("Received webhook request for elevenlab")
 
     raw = await request.body()
@@ -99,21 +99,21 @@ async def receive_webhook(request: Request,db: Session = Depends(get_db)):
     if not db:
         raise HTTPException(status_code=500, detail="Database connection error")
     
-    elevenlabs_service = ElevenLabsService(db=db)  # Replace with actual DB session and service
+    elevenlabs_service = AsyncElevenLabsService(db=db)  # Replace with actual DB session and service
 
-    conversation_created= elevenlabs_service.import_transcript_as_conversation(
+    import_result = await elevenlabs_service.import_transcript_as_conversation(
         user_id=user_id,  # Replace with actual user ID if available
         transcript_list=transcript_list
     )
 
     room_name = f"user_{user_id}_conversations"
     print("[WS] Emitting user message")
-    # print(conversation_created)
+    # print(import_result)
 
     # Step 3: Notify via WebSocket
     # await ws_manager.broadcast(
     #     room=room_name,
-    #     message=json.dumps(conversation_created)
+    #     message=json.dumps(import_result)
     # )
     
     await ws_manager.broadcast(
@@ -121,4 +121,6 @@ async def receive_webhook(request: Request,db: Session = Depends(get_db)):
         message=json.dumps({"event": "new_conversation"})
     )
 
+    return import_result
+
 # Add the router to the main FastAPI app
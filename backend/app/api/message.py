@@ -1,27 +1,36 @@
 import asyncio
 import json
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form,WebSocket,WebSocketDisconnect
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, WebSocket,WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.message import Message, MessageCreate, MessageUpdate
-from app.services.message_service import MessageService
-from app.services.conversation_service import ConversationService
-from app.db.database import get_db
+from app.services.message_service import MessageService, AsyncMessageService
+from app.services.conversation_service import ConversationService, AsyncConversationService
+from app.db.database import get_db, get_read_db, get_async_db, AsyncSessionLocal
 from app.schemas.user import User  # Import User schema if needed for authentication
 from app.api.auth import get_current_user  # Import the dependency to get the current user
 
 from typing import Optional
 from uuid import uuid4
 from app.schemas.message import Message as MessageSchema
-import os
-import httpx
 from app.websocket_manager import ws_manager    # Import the WebSocket manager
+from app.agent_queue import agent_queue, AgentQueueFull, Reservation
+from app.agent_client import agent_client
+from app.core.storage import save_upload
+from app.services.agent_service import AsyncAgentService
+from app.core.config import settings
 
 router = APIRouter()
 
 @router.get("/conversations/{conversation_id}/messages", response_model=list[Message])
 def get_messages_for_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    before: Optional[int] = Query(None, description="Only messages with an id lower than this"),
+    after: Optional[int] = Query(None, description="Only messages with an id greater than this"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     # Check conversation ownership
@@ -30,12 +39,12 @@ def get_messages_for_conversation(
     if not conversation or (conversation.user_id != current_user.id and current_user.type != "admin"):
         raise HTTPException(status_code=403, detail="Not authorized to access these messages")
     service = MessageService(db)
-    return service.get_messages_by_conversation(conversation_id)
+    return service.get_messages_by_conversation(conversation_id, before=before, after=after, limit=limit)
 
 @router.get("/messages/{message_id}", response_model=Message)
 def get_message(
     message_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     service = MessageService(db)
@@ -59,7 +68,7 @@ async def websocket_endpoint(websocket: WebSocket, room_name: str):
             # Optionally, echo or process incoming messages
             await ws_manager.broadcast(room_name, data)
     except WebSocketDisconnect:
-        ws_manager.disconnect(websocket, room_name)
+        await ws_manager.disconnect(websocket, room_name)
 
 @router.post("/messages", response_model=Message)
 async def create_message(
@@ -67,30 +76,48 @@ async def create_message(
     conversation_id: Optional[int] = Form(None),  # Now optional
     link: str = Form(...),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # If conversation_id is provided, check ownership
     if conversation_id is not None:
-        conversation_service = ConversationService(db)
-        conversation = conversation_service.get_conversation(conversation_id)
+        conversation_service = AsyncConversationService(db)
+        conversation = await conversation_service.get_conversation(conversation_id)
         if not conversation or conversation.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to add messages to this conversation")
     else:
         conversation = None  # Or handle as needed
 
+    queued = settings.AGENT_REPLY_MODE == "queued"
+    slot = None
+    if queued:
+        # Held from before the message is saved, so a saved message always gets its reply job
+        try:
+            slot = agent_queue.reserve()
+        except AgentQueueFull:
+            raise HTTPException(status_code=503, detail="Agents are busy, please retry shortly")
+    try:
+        return await post_message(content, conversation_id, link, file, db, current_user, slot)
+    finally:
+        if slot is not None:
+            slot.release()  # No-op once submitted
+
+
+async def post_message(
+    content: str,
+    conversation_id: Optional[int],
+    link: str,
+    file: Optional[UploadFile],
+    db: AsyncSession,
+    current_user: User,
+    slot: Optional[Reservation],
+):
     file_path = None
     if file:
-        UPLOAD_DIR = "uploads/messages"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{file.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f_out:
-            f_out.write(await file.read())
-        file_path = f"{UPLOAD_DIR}/{filename}"
+        file_path = (await save_upload(file, "messages", db)).path
 
-    service = MessageService(db)
-    message = service.create_message(
+    service = AsyncMessageService(db)
+    message = await service.create_message(
         user_id=current_user.id,
         content=content,
         is_systen=False,  # or Form(...) if you want to allow setting this
@@ -113,24 +140,59 @@ async def create_message(
     room_name = f"conversation_{message.conversation_id}"
     print("[WS] Emitting user message")
     await ws_manager.broadcast(room_name, json.dumps(message_data))  # or send JSON if you want
-    
 
-    
+    if slot is not None:
+        # The reply is delivered later over the conversation_{id} room
+        queue_system_response(
+            slot,
+            user_message=content,
+            conversation_id=message.conversation_id,
+            agent_link=link,
+            current_user=current_user,
+        )
+        return JSONResponse(
+            status_code=202,
+            content={"id": message.id, "conversation_id": message.conversation_id, "status": "queued"},
+        )
+
     # Wait for thse system response to be generated
-    await generate_system_response(
-        user_message=content,
-        conversation_id=message.conversation_id, # Use the conversation_id from the saved message! to avoid creating a new conversation
-        agent_link=link,
-        db=db,
-        current_user=current_user,
-    )
+    try:
+        await generate_system_response(
+            user_message=content,
+            conversation_id=message.conversation_id, # Use the conversation_id from the saved message! to avoid creating a new conversation
+            agent_link=link,
+            db=db,
+            current_user=current_user,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The agent did not reply in time")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="The agent could not be reached")
 
     return message
 
 
+def queue_system_response(slot: Reservation, user_message: str, conversation_id: int, agent_link: str, current_user: User):
+    """
+    Schedules generate_system_response on the agent reply queue, in the slot reserved for it.
+    The job opens its own session since the request's one is closed by then.
+    """
+
+    async def job():
+        async with AsyncSessionLocal() as db:
+            await generate_system_response(
+                user_message=user_message,
+                conversation_id=conversation_id,
+                agent_link=agent_link,
+                db=db,
+                current_user=current_user,
+            )
+
+    slot.submit(agent_link, job)
+
 
 # Example system_response function
-async def generate_system_response(user_message: str, conversation_id: int, agent_link: str, db: Session, current_user: User):
+async def generate_system_response(user_message: str, conversation_id: int, agent_link: str, db: AsyncSession, current_user: User):
     """
     Calls n8n to get a system response, saves it as a message, and emits it.
     """
@@ -139,22 +201,41 @@ async def generate_system_response(user_message: str, conversation_id: int, agen
     print(agent_link)
 
     # Call your n8n webhook or API to get the system response
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        n8n_response = await client.post(
-            agent_link,
-            json={"message": user_message}
-        )
-
-        print("n8n status code:", n8n_response.status_code)
-        print("n8n response text:", n8n_response.text)
-
-        system_content = n8n_response.text
+    agent = await AsyncAgentService(db).get_agent_by_link(agent_link)
+    room_name = f"conversation_{conversation_id}"
+    stream_id = None
+    try:
+        if settings.AGENT_STREAM_REPLIES:
+            # Forward each delta as it arrives; the message row is written once the stream ends
+            stream_id = uuid4().hex
+            parts = []
+            async for delta in agent_client.stream(agent_link, {"message": user_message}, agent=agent):
+                parts.append(delta)
+                await ws_manager.broadcast(room_name, json.dumps({
+                    "event": "agent_delta",
+                    "conversation_id": conversation_id,
+                    "stream_id": stream_id,
+                    "delta": delta,
+                }))
+            system_content = "".join(parts)
+        else:
+            n8n_response = await agent_client.post(agent_link, {"message": user_message}, agent=agent)
 
+            print("n8n status code:", n8n_response.status_code)
+            print("n8n response text:", n8n_response.text)
 
+            system_content = n8n_response.text
+    except Exception:
+        # Inline or queued, the room learns the reply failed; with stream_id, clients drop the draft
+        error = {"event": "agent_error", "conversation_id": conversation_id}
+        if stream_id:
+            error["stream_id"] = stream_id
+        await ws_manager.broadcast(room_name, json.dumps(error))
+        raise
 
     # Save the system message
-    service = MessageService(db)
-    message = service.create_message(
+    service = AsyncMessageService(db)
+    message = await service.create_message(
         user_id=None,  # or a system user id
         content=system_content,
         is_systen=True,
@@ -173,9 +254,10 @@ async def generate_system_response(user_message: str, conversation_id: int, agen
                 "id": None if message.is_systen else current_user.id,  # If it's a system message, user_id is None
             }
     }
+    if stream_id:
+        message_data["stream_id"] = stream_id  # Lets clients swap the streamed draft for the saved message
 
     print("[WS] Emitting system message")
-    room_name = f"conversation_{message.conversation_id}"
     await asyncio.sleep(0.1)  # Simulate some delay for the system response generation
     await ws_manager.broadcast(room_name, json.dumps(message_data))  # or send JSON if you want
 
@@ -1,9 +1,11 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.schemas.payment import Payment, PaymentCreate, PaymentUpdate
 from app.services.payment_service import PaymentService
 from app.services.subscription_service import SubscriptionService
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
+from app.core.ndjson import AFTER, LIMIT, FORMAT, ndjson_response
 from app.schemas.user import User  # Import User schema if needed for authentication
 from app.api.auth import get_current_user  # Import the dependency to get the current user
 
@@ -12,13 +14,20 @@ router = APIRouter()
 @router.get("/users/{user_id}/payments", response_model=list[Payment])
 def get_payments_by_user(
     user_id: int,
+    after: Optional[int] = AFTER,
+    limit: int = LIMIT,
+    output: str = FORMAT,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.id != user_id and current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to view these payments")
+    if output == "ndjson":
+        return ndjson_response(
+            SessionLocal, lambda stream_db: PaymentService(stream_db).payments_query(user_id=user_id, after=after), Payment
+        )
     service = PaymentService(db)
-    return service.get_payments_by_user(user_id)
+    return service.get_payments_by_user(user_id, after=after, limit=limit)
 
 @router.get("/payments/{payment_id}", response_model=Payment)
 def get_payment(payment_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -33,6 +42,9 @@ def get_payment(payment_id: int, db: Session = Depends(get_db), current_user: Us
 @router.get("/subscriptions/{subscription_id}/payments", response_model=list[Payment])
 def get_payments_by_subscription(
     subscription_id: int,
+    after: Optional[int] = AFTER,
+    limit: int = LIMIT,
+    output: str = FORMAT,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -42,8 +54,14 @@ def get_payments_by_subscription(
         raise HTTPException(status_code=404, detail="Subscription not found")
     if subscription.user_id != current_user.id and current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to access payments for this subscription")
+    if output == "ndjson":
+        return ndjson_response(
+            SessionLocal,
+            lambda stream_db: PaymentService(stream_db).payments_query(subscription_id=subscription_id, after=after),
+            Payment,
+        )
     service = PaymentService(db)
-    return service.get_payments_by_subscription(subscription_id)
+    return service.get_payments_by_subscription(subscription_id, after=after, limit=limit)
 
 @router.post("/payments", response_model=Payment)
 def create_payment(payment: PaymentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -1,29 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.plan import Plan, PlanCreate, PlanUpdate
-from app.services.plan_service import PlanService
-from app.db.database import get_db
+from app.services.plan_service import PlanService, AsyncPlanService
+from app.db.database import get_db, get_read_db, get_async_db, SessionLocal
+from app.core.catalog import catalog_snapshot, catalog_response
 from app.schemas.user import User  # Import User schema if needed for authentication
 from app.api.auth import get_current_user  # Import the dependency to get the current user
+from app.core.storage import save_upload
 
-import os
-from uuid import uuid4
 import json
 
 router = APIRouter()
 
+def _load_plans(active_only: bool):
+    # From the primary: a lagging replica would keep the old catalog cached
+    with SessionLocal() as db:
+        service = PlanService(db)
+        return service.get_active_plans() if active_only else service.get_plans()
+
 @router.get("/plans", response_model=list[Plan])
-def get_plans(db: Session = Depends(get_db)):
-    service = PlanService(db)
-    return service.get_plans()
+def get_plans(request: Request):
+    snapshot = catalog_snapshot("plans", Plan, lambda: _load_plans(active_only=False))
+    return catalog_response(request, snapshot)
 
 @router.get("/plans/active", response_model=list[Plan])
-def get_active_plans(db: Session = Depends(get_db)):
-    service = PlanService(db)
-    return service.get_active_plans()
+def get_active_plans(request: Request):
+    snapshot = catalog_snapshot("plans_active", Plan, lambda: _load_plans(active_only=True))
+    return catalog_response(request, snapshot)
 
 @router.get("/plans/{plan_id}", response_model=Plan)
-def get_plan(plan_id: int, db: Session = Depends(get_db)):
+def get_plan(plan_id: int, db: Session = Depends(get_read_db)):
     service = PlanService(db)
     plan = service.get_plan(plan_id)
     if not plan:
@@ -39,20 +46,14 @@ async def create_plan(
     max_agents: int = Form(...),
     is_active: bool = Form(True),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
     image_path = None
     if image:
-        UPLOAD_DIR = "uploads/plans"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{image.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await image.read())
-        image_path = f"{UPLOAD_DIR}/{filename}"
+        image_path = (await save_upload(image, "plans", db)).path
     # Parse feature_list if sent as JSON string
     import json
     features = json.loads(feature_list) if feature_list else None
@@ -65,8 +66,8 @@ async def create_plan(
         "is_active": is_active,
         "image_path": image_path
     }
-    service = PlanService(db)
-    return service.create_plan(plan_data)
+    service = AsyncPlanService(db)
+    return await service.create_plan(plan_data)
 
 @router.put("/plans/{plan_id}", response_model=Plan)
 async def update_plan(
@@ -78,26 +79,18 @@ async def update_plan(
     max_agents: int = Form(None),
     is_active: bool = Form(None),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
-    service = PlanService(db)
-    plan = service.get_plan(plan_id)
+    service = AsyncPlanService(db)
+    plan = await service.get_plan(plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
-    image_path = plan.image_path
+    image_path = None  # Only a new upload replaces the image, and only it adds a blob reference
     if image:
-        import os
-        from uuid import uuid4
-        UPLOAD_DIR = "uploads/plans"
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        filename = f"{uuid4()}_{image.filename}"
-        file_location = os.path.join(UPLOAD_DIR, filename)
-        with open(file_location, "wb") as f:
-            f.write(await image.read())
-        image_path = f"{UPLOAD_DIR}/{filename}"
+        image_path = (await save_upload(image, "plans", db)).path
 
     features = json.loads(feature_list) if feature_list else None
     update_data = {
@@ -111,7 +104,7 @@ async def update_plan(
     }
     # Remove None values
     update_data = {k: v for k, v in update_data.items() if v is not None}
-    return service.update_plan(plan, update_data)
+    return await service.update_plan(plan, update_data)
 @router.delete("/plans/{plan_id}")
 def delete_plan(
     plan_id: int,
@@ -1,8 +1,10 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.schemas.subscription import Subscription, SubscriptionCreate, SubscriptionUpdate, SubscriptionWithPayments
 from app.services.subscription_service import SubscriptionService
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
+from app.core.ndjson import AFTER, LIMIT, FORMAT, ndjson_response
 from app.db.models import Agent  # Import Agent model if needed for agent management
 from app.schemas.user import User  # Import User schema if needed for authentication
 from app.api.auth import get_current_user  # Import the dependency to get the current user
@@ -32,23 +34,45 @@ def get_active_subscriptions_by_user(
     return service.get_active_subscriptions_by_user(user_id)
 
 @router.get("/subscriptions", response_model=list[Subscription])
-def get_subscriptions(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_subscriptions(
+    after: Optional[int] = AFTER,
+    limit: int = LIMIT,
+    output: str = FORMAT,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
+    if output == "ndjson":
+        return ndjson_response(
+            SessionLocal, lambda stream_db: SubscriptionService(stream_db).subscriptions_query(after=after), Subscription
+        )
     service = SubscriptionService(db)
-    return service.get_subscriptions()
+    return service.get_subscriptions(after=after, limit=limit)
 
 @router.get("/subscriptions/active", response_model=list[Subscription])
-def get_active_subscriptions(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_active_subscriptions(
+    after: Optional[int] = AFTER,
+    limit: int = LIMIT,
+    output: str = FORMAT,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.type != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
+    if output == "ndjson":
+        return ndjson_response(
+            SessionLocal,
+            lambda stream_db: SubscriptionService(stream_db).subscriptions_query(active_only=True, after=after),
+            Subscription,
+        )
     service = SubscriptionService(db)
-    return service.get_active_subscriptions()
+    return service.get_active_subscriptions(after=after, limit=limit)
 
 @router.get("/subscriptions/{subscription_id}", response_model=SubscriptionWithPayments)
 def get_subscription(subscription_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     service = SubscriptionService(db)
-    subscription = service.get_subscription(subscription_id)
+    subscription = service.get_subscription_with_payments(subscription_id)
     if not subscription:
         raise HTTPException(status_code=404, detail="Subscription not found")
     if subscription.user_id != current_user.id and current_user.type != "admin":
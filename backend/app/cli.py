@@ -0,0 +1,70 @@
+"""
+Maintenance commands, run from the backend directory:
+
+    python -m app.cli gc-blobs [--dry-run] [--grace-hours 1]
+    python -m app.cli adopt-uploads [--dry-run]
+    python -m app.cli calibrate-bcrypt [--target-ms 250]
+"""
+import argparse
+
+from app.db.database import SessionLocal
+from app.services.blob_service import BlobService
+from app.core.password_hasher import calibrate
+from app.core.config import settings
+
+
+def gc_blobs(args):
+    db = SessionLocal()
+    try:
+        blobs = BlobService(db)
+        drifted = blobs.check_ref_counts(dry_run=args.dry_run)
+        removed = blobs.collect_garbage(grace_seconds=int(args.grace_hours * 3600), dry_run=args.dry_run)
+    finally:
+        db.close()
+    for path, recorded, referenced in drifted:
+        print(f"ref_count {recorded} but {referenced} referencing row(s): {path}" + ("" if args.dry_run else ", corrected"))
+    for path in removed:
+        print(("would remove " if args.dry_run else "removed ") + path)
+    print(f"{len(drifted)} ref_count(s) out of step, {len(removed)} unreferenced blob(s)")
+
+
+def adopt_uploads(args):
+    db = SessionLocal()
+    try:
+        updated = BlobService(db).adopt_legacy_files(dry_run=args.dry_run)
+    finally:
+        db.close()
+    verb = "would be moved" if args.dry_run else "moved"
+    print(f"{updated} row(s) {verb} to the blob store")
+
+
+def calibrate_bcrypt(args):
+    rounds, timings = calibrate(args.target_ms)
+    for cost, ms in timings.items():
+        print(f"rounds={cost:<3} {ms:8.1f} ms" + ("  <- current" if cost == settings.BCRYPT_ROUNDS else ""))
+    print(f"BCRYPT_ROUNDS={rounds}  (highest cost within {args.target_ms:g} ms on this machine)")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gc = commands.add_parser("gc-blobs", help="Check blob ref_counts, then delete stored files no row refers to")
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--grace-hours", type=float, default=1.0, help="Keep blobs younger than this")
+    gc.set_defaults(func=gc_blobs)
+
+    adopt = commands.add_parser("adopt-uploads", help="Move legacy uploads/<category>/ files into the blob store")
+    adopt.add_argument("--dry-run", action="store_true")
+    adopt.set_defaults(func=adopt_uploads)
+
+    calibrate_cmd = commands.add_parser("calibrate-bcrypt", help="Pick BCRYPT_ROUNDS for a target hashing latency")
+    calibrate_cmd.add_argument("--target-ms", type=float, default=250.0)
+    calibrate_cmd.set_defaults(func=calibrate_bcrypt)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
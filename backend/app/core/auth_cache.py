@@ -0,0 +1,46 @@
+import hashlib
+import time
+
+from jose import jwt
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Authenticated users by token subject (email), as User schema snapshots.
+# Invalidation is per process; the TTL bounds how long other workers may serve a stale entry.
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+# Claims of tokens that already passed signature and expiry checks, by SHA-256 of the token.
+# Entries live until the token's own exp, so an expired token is always decoded (and rejected) again.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_MAX_TTL)
+
+def invalidate_principal(email: str):
+    principal_cache.invalidate(email)
+
+def _token_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+def decode_token(token: str, secret_key: str, algorithm: str) -> dict:
+    """jwt.decode, skipped for tokens verified before. Raises JWTError like jwt.decode."""
+    key = _token_key(token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    generation = token_cache.generation
+    claims = jwt.decode(token, secret_key, algorithms=[algorithm])
+    exp = claims.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    token_cache.set(key, claims, generation=generation, ttl=ttl)
+    return claims
+
+# Eviction only: an evicted token that is still signed and unexpired passes jwt.decode on its
+# next use and is cached again. Neither function logs anyone out or locks a deactivated user out.
+
+def evict_token(token: str):
+    """Forgets the token's cached claims; it is verified again on its next use."""
+    token_cache.invalidate(_token_key(token))
+
+def evict_subject(email: str):
+    """Forgets every cached token of the subject and the cached user, e.g. after a password change."""
+    token_cache.invalidate_where(lambda claims: claims.get("sub") == email)
+    invalidate_principal(email)
@@ -0,0 +1,48 @@
+import hashlib
+from typing import Callable, List, NamedTuple, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+class CatalogSnapshot(NamedTuple):
+    body: bytes  # Pre-encoded JSON
+    etag: str
+
+# Public agent and plan listings, rebuilt after admin writes. Invalidation is per process;
+# CATALOG_CACHE_TTL bounds how long another worker keeps serving the previous catalog.
+catalog_cache = TTLCache(maxsize=16, ttl=settings.CATALOG_CACHE_TTL)
+
+def invalidate_catalog(name: str):
+    """name is "agents" or "plans"; drops the full and the active-only listing."""
+    catalog_cache.invalidate(name)
+    catalog_cache.invalidate(name + "_active")
+
+def catalog_snapshot(key: str, schema, load: Callable[[], List]) -> CatalogSnapshot:
+    snapshot = catalog_cache.get(key)
+    if snapshot is not None:
+        return snapshot
+    generation = catalog_cache.generation
+    adapter = TypeAdapter(List[schema])
+    body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True))
+    snapshot = CatalogSnapshot(body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+    catalog_cache.set(key, snapshot, generation=generation)
+    return snapshot
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+def catalog_response(request: Request, snapshot: CatalogSnapshot) -> Response:
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"public, max-age={settings.CATALOG_MAX_AGE}",
+    }
+    if _matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
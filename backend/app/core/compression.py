@@ -0,0 +1,194 @@
+import time
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+
+class CompressionStats:
+    def __init__(self):
+        self.compressed = 0
+        self.skipped_small = 0
+        self.skipped_budget = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "compressed": self.compressed,
+            "skipped_small": self.skipped_small,
+            "skipped_budget": self.skipped_budget,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+            "cpu_ms": round(self.cpu_seconds * 1000, 1),
+        }
+
+class CpuBudget:
+    """
+    Token bucket of compression time: refills at `share` seconds per second (the fraction
+    of one core this worker may spend compressing) and holds at most one second's worth.
+    When it runs dry responses go out uncompressed instead of queueing behind the compressor.
+    """
+
+    def __init__(self, share: float):
+        self.share = share
+        self.available = share
+        self.updated = time.monotonic()
+
+    def allows(self) -> bool:
+        now = time.monotonic()
+        self.available = min(self.share, self.available + (now - self.updated) * self.share)
+        self.updated = now
+        return self.available > 0
+
+    def spend(self, seconds: float):
+        self.available -= seconds
+
+compression_stats = CompressionStats()
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best of br / gzip the client accepts, honouring q-values (q=0 refuses)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self.impl = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        else:
+            self.impl = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed per chunk so streamed responses (NDJSON) are not held back
+        if self.encoding == "br":
+            return self.impl.process(data) + self.impl.flush()
+        return self.impl.compress(data) + self.impl.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self.impl.process(data) + self.impl.finish()
+        return self.impl.compress(data) + self.impl.flush()
+
+class CompressionMiddleware:
+    """
+    Negotiated br/gzip for text-like responses of at least COMPRESSION_MIN_SIZE bytes,
+    within the COMPRESSION_CPU_SHARE budget. Streaming bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.stats = compression_stats
+        self.budget = CpuBudget(settings.COMPRESSION_CPU_SHARE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, compressor: _Compressor, data: bytes, final: bool) -> bytes:
+        started = time.perf_counter()
+        out = compressor.finish(data) if final else compressor.chunk(data)
+        elapsed = time.perf_counter() - started
+        self.budget.spend(elapsed)
+        self.stats.cpu_seconds += elapsed
+        self.stats.bytes_in += len(data)
+        self.stats.bytes_out += len(out)
+        return out
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.downstream(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        stats = self.middleware.stats
+
+        if self.compressor is None:
+            # First body chunk decides: a small complete body is not worth it
+            if not more_body and len(body) < settings.COMPRESSION_MIN_SIZE:
+                stats.skipped_small += 1
+                return await self._send_plain(message)
+            if not self.middleware.budget.allows():
+                stats.skipped_budget += 1
+                return await self._send_plain(message)
+            self.compressor = _Compressor(self.encoding)
+            stats.compressed += 1
+            data = self.middleware.compress(self.compressor, body, final=not more_body)
+            await self._send_start(None if more_body else len(data))
+        else:
+            data = self.middleware.compress(self.compressor, body, final=not more_body)
+        await self.downstream({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _send_plain(self, message):
+        self.passthrough = True
+        await self.downstream(self.start_message)
+        await self.downstream(message)
+
+    async def _send_start(self, length: Optional[int]):
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag  # The bytes differ from the identity representation
+        await self.downstream(self.start_message)
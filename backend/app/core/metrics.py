@@ -0,0 +1,192 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.db.pool_metrics import Histogram
+
+# Upper bounds in seconds, Prometheus style
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STATEMENT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class CounterVec:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: Dict[Tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = self.values if self.values or self.labelnames else {(): 0}
+            for labels, value in sorted(values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class HistogramVec:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.children: Dict[Tuple, Histogram] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float):
+        with self.lock:
+            child = self.children.get(labels)
+            if child is None:
+                child = self.children[labels] = Histogram(self.buckets)
+            child.observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, child in sorted(self.children.items()):
+                cumulative = 0
+                for bound, count in zip(child.buckets, child.counts):
+                    cumulative += count
+                    le = f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {child.count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {child.sum:g}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {child.count}")
+        return lines
+
+class GaugeFunc:
+    """Gauge read from existing state when scraped, e.g. the websocket manager's connection count."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.read():g}"]
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(CounterVec(
+    "friday_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_latency = registry.register(HistogramVec(
+    "friday_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")))
+http_statements = registry.register(HistogramVec(
+    "friday_http_request_db_statements", "SQL statements issued per request.", ("method", "route"), STATEMENT_BUCKETS))
+db_statements = registry.register(CounterVec(
+    "friday_db_statements_total", "SQL statements by route template; (background) outside requests.", ("route",)))
+db_seconds = registry.register(CounterVec(
+    "friday_db_seconds_total", "Time spent executing SQL by route template.", ("route",)))
+agent_calls = registry.register(CounterVec(
+    "friday_agent_calls_total", "n8n agent webhook calls by agent link and outcome.", ("link", "status")))
+agent_latency = registry.register(HistogramVec(
+    "friday_agent_call_duration_seconds", "n8n agent webhook latency, to the end of the reply.", ("link",)))
+ws_fanout = registry.register(HistogramVec(
+    "friday_ws_fanout_duration_seconds", "Websocket broadcast time until every socket in the room has sent it."))
+ws_evictions = registry.register(CounterVec(
+    "friday_ws_evictions_total", "Websocket clients dropped for being too slow or dead."))
+
+BACKGROUND = "(background)"
+UNMATCHED = "(unmatched)"  # 404s and the static file mounts
+
+class RequestMetrics:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+# Set per request by MetricsMiddleware; copied into the threadpool for sync routes
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    request = current_request.get()
+    if request is None:
+        db_statements.inc((BACKGROUND,))
+        db_seconds.inc((BACKGROUND,), elapsed)
+    else:
+        request.statements += 1
+        request.db_seconds += elapsed
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine):
+    """Counts and times every statement of a (sync) engine; pass async_engine.sync_engine for the async one."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+class MetricsMiddleware:
+    """
+    Records latency, status and SQL statements / time per route template (/users/{user_id}/inbox,
+    not /users/7/inbox, so the number of series stays bounded). Pure ASGI, streaming is not buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics()
+        token = current_request.set(request)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED)
+            method = scope["method"]
+            http_requests.inc((method, route, str(status)))
+            http_latency.observe((method, route), time.perf_counter() - started)
+            http_statements.observe((method, route), request.statements)
+            if request.statements:
+                db_statements.inc((route,), request.statements)
+                db_seconds.inc((route,), request.db_seconds)
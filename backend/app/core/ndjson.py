@@ -0,0 +1,35 @@
+from typing import Callable
+
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Query as OrmQuery, Session
+
+from app.core.config import settings
+
+# Shared by the paginated list endpoints: ?after=<last id of the previous page>&limit=50,
+# or ?format=ndjson to stream every row after `after` as one JSON object per line.
+AFTER = Query(None, description="Only rows with an id greater than this (the last id of the previous page)")
+LIMIT = Query(50, ge=1, le=200)
+FORMAT = Query("json", alias="format", pattern="^(json|ndjson)$", description="ndjson streams every row, ignoring limit")
+
+def ndjson_response(session_factory: Callable[[], Session], build_query: Callable[[Session], OrmQuery], schema) -> StreamingResponse:
+    """
+    Streams build_query's rows as NDJSON. The rows are fetched NDJSON_YIELD_PER at a time
+    through a server-side cursor, so memory stays flat however large the table is.
+    The generator opens its own session: the request's one is closed before the body is sent.
+    """
+    adapter = TypeAdapter(schema)
+
+    def lines():
+        db = session_factory()
+        try:
+            # Query.yield_per also turns on stream_results, i.e. a server-side cursor on PostgreSQL
+            query = build_query(db).yield_per(settings.NDJSON_YIELD_PER)
+            for row in query:
+                yield adapter.dump_json(adapter.validate_python(row, from_attributes=True)) + b"\n"
+        finally:
+            db.close()
+
+    # A sync generator: Starlette iterates it in the threadpool, off the event loop
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,155 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.hash import bcrypt
+
+from app.core.config import settings
+from app.db.pool_metrics import Histogram
+
+# Module-level so the worker processes can unpickle them
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.verify(password, hashed)
+    except ValueError:  # Not a bcrypt hash
+        return False
+
+def bcrypt_rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a "$2b$12$..." hash."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class HasherBusy(Exception):
+    """max_pending hashes are already queued or running; the API answers 503 (app.api.auth)."""
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small pool of worker processes, so hashing neither blocks
+    the event loop nor holds a threadpool slot and the GIL for ~250 ms.
+    At most max_pending hashes may be queued or running; beyond that callers get HasherBusy.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.latency_ms = Histogram()
+
+    def start(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a process that runs threads and holds DB connections is unsafe
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+    def stop(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, fn, *args) -> Future:
+        if self.executor is None:
+            self.start()
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy(f"{self.max_pending} password hashes already pending")
+            self.pending += 1
+        started = time.perf_counter()
+
+        def done(_future):
+            with self.lock:
+                self.pending -= 1
+                self.completed += 1
+                self.latency_ms.observe((time.perf_counter() - started) * 1000)
+
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(done)
+        return future
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(_hash, password, self.rounds))
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self._submit(_verify, password, hashed))
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verifies the password; on success also returns a new hash if the stored cost is not the configured one."""
+        if not await self.verify(password, hashed):
+            return False, None
+        if bcrypt_rounds(hashed) == self.rounds:
+            return True, None
+        self.rehashed += 1
+        return True, await self.hash(password)
+
+    # Blocking variants for code without an event loop: the CLI, scripts, sync services run in
+    # the threadpool. On the event loop they would stall every request for the whole hash.
+    def _blocking(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        raise RuntimeError("hash_sync()/verify_sync() block; await hash()/verify() on the event loop")
+
+    def hash_sync(self, password: str) -> str:
+        self._blocking()
+        return self._submit(_hash, password, self.rounds).result()
+
+    def verify_sync(self, password: str, hashed: str) -> bool:
+        self._blocking()
+        return self._submit(_verify, password, hashed).result()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "latency_ms": self.latency_ms.as_dict(),
+            }
+
+def calibrate(target_ms: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3):
+    """
+    Times bcrypt in this process for each cost factor and returns
+    (rounds, timings) where rounds is the highest cost whose median stays within target_ms.
+    """
+    timings = {}
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        runs = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            _hash("calibration-password", rounds)
+            runs.append((time.perf_counter() - started) * 1000)
+        timings[rounds] = sorted(runs)[len(runs) // 2]
+        if timings[rounds] > target_ms:
+            break  # Every extra round doubles the cost
+        best = rounds
+    return best, timings
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS,
+)
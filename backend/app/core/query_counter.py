@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+# Open counters. Process-wide on purpose: a request made through TestClient runs on
+# the client's event-loop thread, so a ContextVar set by the test would not reach it.
+_active: List["QueryCount"] = []
+_lock = threading.Lock()
+
+def format_statements(statements: List[str], indent: str = "  ") -> str:
+    """One line per distinct statement, first-seen order, with how often it ran: an N+1 shows as "20x"."""
+    counts: Dict[str, int] = {}
+    for statement in statements:
+        statement = " ".join(statement.split())
+        counts[statement] = counts.get(statement, 0) + 1
+    return "\n".join(f"{indent}{count}x {statement}" for statement, count in counts.items())
+
+class QueryCount:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def report(self) -> str:
+        return format_statements(self.statements)
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, name: str, limit: int, counted: QueryCount):
+        self.name = name
+        self.limit = limit
+        self.counted = counted
+        super().__init__(f"{name}: {counted.count} queries, budget is {limit}\n{counted.report()}")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active:
+        with _lock:
+            for counter in _active:
+                counter.statements.append(statement)
+
+def attach(engine):
+    """Makes the engine's statements visible to count_queries(); pass async_engine.sync_engine for the async one."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+@contextmanager
+def count_queries():
+    """
+    Records every statement any attached engine runs while the block is open,
+    from any thread. For tests and checks only, not for concurrent production traffic.
+
+        with count_queries() as counted:
+            client.get("/users/1/inbox", headers=headers)
+        print(counted.count, counted.report())
+    """
+    counter = QueryCount()
+    with _lock:
+        _active.append(counter)
+    try:
+        yield counter
+    finally:
+        with _lock:
+            _active.remove(counter)
+
+@contextmanager
+def query_budget(limit: int, name: Optional[str] = None):
+    """Like count_queries(), but raises QueryBudgetExceeded, listing the statements, when the block runs more than `limit`."""
+    with count_queries() as counted:
+        yield counted
+    if counted.count > limit:
+        raise QueryBudgetExceeded(name or "block", limit, counted)
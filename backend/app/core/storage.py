@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+from typing import NamedTuple
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.blob_service import AsyncBlobService, blob_path
+
+UPLOAD_TMP_DIR = "uploads_tmp"  # Outside the /uploads static mount, same filesystem for the atomic rename
+CHUNK_SIZE = 64 * 1024
+FORM_OVERHEAD_BYTES = 64 * 1024  # Boundaries, headers and the form's other fields
+
+# Multipart routes by path prefix, for UploadLimitMiddleware; anything else gets the largest limit
+UPLOAD_ROUTES = [
+    ("/messages", "messages"),
+    ("/plans", "plans"),
+    ("/agents", "plans"),
+    ("/signup", "profiles"),
+    ("/admin/create-user", "profiles"),
+    ("/update-profile", "profiles"),
+]
+
+class StoredUpload(NamedTuple):
+    path: str  # Relative path stored in the database, e.g. "uploads/blobs/ab/ab12...ef.png"
+    sha256: str
+    size: int
+
+def max_upload_bytes(category: str) -> int:
+    limits = {
+        "messages": settings.UPLOAD_MAX_BYTES_MESSAGES,
+        "profiles": settings.UPLOAD_MAX_BYTES_PROFILES,
+        "plans": settings.UPLOAD_MAX_BYTES_PLANS,
+    }
+    return limits[category]
+
+def max_body_bytes(path: str) -> int:
+    for prefix, category in UPLOAD_ROUTES:
+        if path.startswith(prefix):
+            return max_upload_bytes(category) + FORM_OVERHEAD_BYTES
+    return max(max_upload_bytes(category) for _, category in UPLOAD_ROUTES) + FORM_OVERHEAD_BYTES
+
+class UploadLimitMiddleware:
+    """
+    Refuses multipart bodies larger than the route's upload limit before Starlette parses and
+    spools them: from Content-Length up front, or by counting chunks when there is none.
+    save_upload still enforces the exact per-file limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_body_bytes(scope["path"])
+        detail = f"Request body too large (limit is {limit} bytes)"
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            if not content_length.isdigit() or int(content_length) > limit:
+                response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+                await response(scope, receive, send)
+                return
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+def _write_chunk(out, digest, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+def _discard(out, tmp_path: str):
+    out.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+async def save_upload(file: UploadFile, category: str, db: AsyncSession) -> StoredUpload:
+    """
+    Streams an upload to a temp file in fixed-size chunks, off the event loop,
+    enforcing the category size limit and hashing the content along the way,
+    then atomically renames it into the content-addressed blob store.
+    Identical content is stored once; the blob's reference is added to db without committing.
+    """
+    limit = max_upload_bytes(category)
+    await run_in_threadpool(os.makedirs, UPLOAD_TMP_DIR, exist_ok=True)
+
+    fd, tmp_path = await run_in_threadpool(tempfile.mkstemp, dir=UPLOAD_TMP_DIR)
+    out = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=413, detail=f"File too large (limit is {limit} bytes)")
+            await run_in_threadpool(_write_chunk, out, digest, chunk)
+        await run_in_threadpool(out.close)
+
+        sha256 = digest.hexdigest()
+        blobs = AsyncBlobService(db)
+        blob = await blobs.get_blob(sha256)
+        extension = os.path.splitext(file.filename or "")[1].lower()[:16]
+        path = blob.path if blob else blob_path(sha256, extension)
+        # Reference before looking at the file: acquire() locks the blob row until our commit,
+        # so a concurrent collect_garbage either sees the reference or has already removed the file
+        await blobs.acquire(sha256, path, size)
+        if await run_in_threadpool(os.path.exists, path):
+            await run_in_threadpool(os.remove, tmp_path)  # Same content is already stored
+        else:
+            await run_in_threadpool(os.makedirs, os.path.dirname(path), exist_ok=True)
+            await run_in_threadpool(os.replace, tmp_path, path)
+    except BaseException:
+        await run_in_threadpool(_discard, out, tmp_path)
+        raise
+
+    return StoredUpload(path=path, sha256=sha256, size=size)
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose URL changes with their content, so browsers may cache them forever."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Table, Integer, String, Boolean, Text, Numeric, JSON, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Table, Integer, BigInteger, String, Boolean, Text, Numeric, Float, JSON, DateTime, ForeignKey, Enum, Index, text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from sqlalchemy.sql import func
@@ -34,6 +34,9 @@ subscription_agents = Table(
 
 class Agent(Base):
     __tablename__ = "agents"
+    __table_args__ = (
+        Index("ix_agents_link", "link"),  # Every chat message looks its agent up by webhook link
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     eleven_labs_id = Column(String(255), nullable=False, unique=True)  # Unique identifier for Eleven Labs agent
@@ -44,6 +47,9 @@ class Agent(Base):
     feature_list = Column(JSON)
     is_active = Column(Boolean, default=True)
     image_path = Column(String(255))
+    connect_timeout = Column(Float, nullable=True)  # Seconds, NULL uses the app default
+    read_timeout = Column(Float, nullable=True)
+    total_timeout = Column(Float, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -73,6 +79,9 @@ class Plan(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -82,6 +91,9 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
@@ -98,6 +110,17 @@ class SubscriptionStatus(enum.Enum):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_user_id_status_created_at", "user_id", "status", "created_at"),
+        # At most one active subscription per user; also the index behind the active-subscription lookup
+        Index(
+            "uq_subscriptions_user_id_active",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -121,6 +144,11 @@ class Subscription(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # With id: the payment lists page in id order within a user / subscription
+        Index("ix_payments_user_id_id", "user_id", "id"),
+        Index("ix_payments_subscription_id_id", "subscription_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -134,4 +162,14 @@ class Payment(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", backref="payments", passive_deletes=True)
-    subscription = relationship("Subscription", back_populates="payments", passive_deletes=True)
\ No newline at end of file
+    subscription = relationship("Subscription", back_populates="payments", passive_deletes=True)
+
+
+class FileBlob(Base):
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)  # Hex digest of the content
+    path = Column(String(255), nullable=False)  # uploads/blobs/<2 chars>/<digest><ext>
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Rows pointing at this blob
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
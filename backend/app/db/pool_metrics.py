@@ -0,0 +1,96 @@
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+WAIT_BUCKETS_MS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = WAIT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def as_dict(self) -> dict:
+        cumulative = 0
+        buckets: Dict[str, int] = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"le_{bound:g}"] = cumulative
+        buckets["le_inf"] = self.count
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max, 2),
+            "buckets": buckets,
+        }
+
+class PoolStats:
+    def __init__(self):
+        self.wait_ms = Histogram()
+        self.checkouts = 0
+        self.timeouts = 0
+
+class _TimedPoolMixin:
+    """Times every checkout, including the wait for a free connection when the pool is exhausted."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats  # Keep the numbers across engine.dispose()
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.wait_ms.observe((time.perf_counter() - started) * 1000)
+        self.stats.checkouts += 1
+        return connection
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def pool_stats(pool, max_overflow: int) -> dict:
+    """Live gauges plus the checkout wait histogram for one engine's pool, built with max_overflow."""
+    stats = getattr(pool, "stats", None)
+    if stats is None:
+        return {"pool": type(pool).__name__}  # e.g. SQLite, which keeps its default pool
+    size = pool.size()
+    return {
+        "pool": type(pool).__name__,
+        "size": size,
+        "max_overflow": max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(pool.checkedout() / (size + max(max_overflow, 0)), 3) if size else 0.0,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_ms": stats.wait_ms.as_dict(),
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Clients that wrote recently, by a digest of their Authorization header: their reads
+# stay on the primary for READ_YOUR_WRITES_SECONDS so they see their own changes.
+# Kept per process; with several workers a client can still land on one that did not see the write.
+recent_writers = TTLCache(maxsize=settings.READ_YOUR_WRITES_MAX_CLIENTS, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def client_key(authorization: Optional[str]) -> Optional[bytes]:
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode("utf-8")).digest()
+
+def wrote_recently(authorization: Optional[str]) -> bool:
+    key = client_key(authorization)
+    return key is not None and recent_writers.get(key) is not None
+
+class ReadYourWritesMiddleware:
+    """Marks the client of every successful non-GET request as a recent writer."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = client_key(headers.get(b"authorization", b"").decode("latin-1"))
+
+        async def mark_on_success(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and key is not None:
+                recent_writers.set(key, True)
+            await send(message)
+
+        await self.app(scope, receive, mark_on_success)
+
+class ReplicaHealth:
+    """
+    Pings the replica at most every REPLICA_HEALTH_CHECK_SECONDS; reads fall back to the primary while it is down.
+    One request runs the ping, bounded by REPLICA_CONNECT_TIMEOUT, and the others meanwhile use the last result
+    instead of queueing behind it.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.healthy = True
+        self.checked_at = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.failures = 0
+        self.fallbacks = 0
+
+    def available(self) -> bool:
+        if time.monotonic() - self.checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+            return self.healthy
+        if not self.lock.acquire(blocking=False):
+            return self.healthy  # Another request is checking
+        try:
+            if time.monotonic() - self.checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+                return self.healthy  # Another request just checked
+            try:
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                self.healthy = True
+            except Exception as exc:
+                self.mark_down(exc)
+            self.checked_at = time.monotonic()
+        finally:
+            self.lock.release()
+        return self.healthy
+
+    def mark_down(self, exc: Exception):
+        if self.healthy:
+            print(f"[db] Read replica unavailable, reading from the primary: {exc!r}")
+        self.healthy = False
+        self.failures += 1
+        self.checked_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "recent_writers": recent_writers.stats()["size"],
+        }
+
+class ReplicaSession(Session):
+    """
+    Session bound to the replica. A statement the replica fails with a connection or
+    recovery-conflict error is run again on the primary, and the rest of the request stays
+    there. Only for read-only sessions, where repeating a statement is safe.
+    """
+
+    def __init__(self, *args, primary: Engine, health: ReplicaHealth, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        self.health = health
+
+    def _on_replica(self, run, *args, **kwargs):
+        try:
+            return run(self, *args, **kwargs)
+        except DBAPIError as exc:
+            if self.bind is self.primary or not (isinstance(exc, OperationalError) or exc.connection_invalidated):
+                raise
+            self.health.mark_down(exc)
+            self.health.fallbacks += 1
+            self.rollback()
+            self.bind = self.primary
+            return run(self, *args, **kwargs)
+
+    # Query, get() and relationship loads all go through execute()
+    def execute(self, *args, **kwargs):
+        return self._on_replica(Session.execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._on_replica(Session.scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._on_replica(Session.scalars, *args, **kwargs)
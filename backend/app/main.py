@@ -1,18 +1,47 @@
 # from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import home, agent, plan, conversation, message, subscription, payment, auth, eleven_labs  # Import all routers
+from app.api import home, agent, plan, conversation, message, subscription, payment, auth, eleven_labs, admin, metrics  # Import all routers
 # from app.api import auth  # Uncomment if you have an auth router
 import uvicorn
 from fastapi.staticfiles import StaticFiles
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from app.agent_queue import agent_queue
+from app.agent_client import agent_client
+from app.core.password_hasher import HasherBusy, password_hasher
+from app.core.storage import ImmutableStaticFiles, UploadLimitMiddleware
+from app.websocket_manager import ws_manager
+from app.db.read_routing import ReadYourWritesMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ws_manager.start()
+    agent_client.start()
+    agent_queue.start()
+    password_hasher.start()
+    yield
+    password_hasher.stop()
+    await agent_queue.stop()
+    await agent_client.close()
+    await ws_manager.stop()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_exception_handler(HasherBusy, auth.hasher_busy_handler)
 
 os.makedirs("uploads/messages", exist_ok=True)
 os.makedirs("uploads/profiles", exist_ok=True)
+os.makedirs("uploads/blobs", exist_ok=True)
+# Blobs are content-addressed and never change, so they get long-lived cache headers
+app.mount("/uploads/blobs", ImmutableStaticFiles(directory="uploads/blobs"), name="blobs")
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+app.add_middleware(UploadLimitMiddleware)  # Inside CORS, so a 413 still carries the CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8080"],
@@ -20,6 +49,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)  # Outermost, so its latency covers the whole stack
 
 app.include_router(home.router)
 app.include_router(agent.router)
@@ -30,6 +62,8 @@ app.include_router(subscription.router)
 app.include_router(payment.router)
 app.include_router(auth.router)
 app.include_router(eleven_labs.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -11,6 +11,9 @@ class AgentBase(BaseModel):
     feature_list: Optional[List[Any]] = None
     is_active: Optional[bool] = True
     image_path: Optional[str] = None
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    total_timeout: Optional[float] = None
 
 class AgentCreate(AgentBase):
     pass
@@ -24,6 +27,9 @@ class AgentUpdate(BaseModel):
     feature_list: Optional[List[Any]] = None
     is_active: Optional[bool] = None
     image_path: Optional[str] = None
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+    total_timeout: Optional[float] = None
 
 
 class Agent(AgentBase):
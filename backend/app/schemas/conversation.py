@@ -18,6 +18,17 @@ class ConversationInDB(ConversationBase):
     class Config:
         orm_mode = True
 
+class ConversationSummary(BaseModel):
+    id: int
+    created_at: Optional[datetime] = None
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_message_is_systen: Optional[bool] = None
+    last_activity_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 # For reading with nested messages
 from app.schemas.message import Message
 class Conversation(ConversationInDB):
@@ -1,5 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.models import Agent
+from app.services.blob_service import BlobService, AsyncBlobService
+from app.core.catalog import invalidate_catalog
 
 class AgentService:
     def __init__(self, db: Session):
@@ -15,20 +19,59 @@ class AgentService:
     def get_agent(self, agent_id: int):
         return self.db.query(Agent).filter(Agent.id == agent_id).first()
 
+    def get_agent_by_link(self, link: str):
+        return self.db.query(Agent).filter(Agent.link == link).first()
+
     def create_agent(self, agent_data: dict):
         agent = Agent(**agent_data)
         self.db.add(agent)
         self.db.commit()
+        invalidate_catalog("agents")
         self.db.refresh(agent)
         return agent
 
     def update_agent(self, agent: Agent, update_data: dict):
+        # save_upload added a reference for the new path, even when it is the same blob
+        if "image_path" in update_data:
+            BlobService(self.db).release(agent.image_path)
         for key, value in update_data.items():
             setattr(agent, key, value)
         self.db.commit()
+        invalidate_catalog("agents")
         self.db.refresh(agent)
         return agent
 
     def delete_agent(self, agent: Agent):
+        BlobService(self.db).release(agent.image_path)
         self.db.delete(agent)
-        self.db.commit()
\ No newline at end of file
+        self.db.commit()
+        invalidate_catalog("agents")
+
+
+class AsyncAgentService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_agent(self, agent_id: int):
+        return await self.db.scalar(select(Agent).where(Agent.id == agent_id))
+
+    async def get_agent_by_link(self, link: str):
+        return await self.db.scalar(select(Agent).where(Agent.link == link))
+
+    async def create_agent(self, agent_data: dict):
+        agent = Agent(**agent_data)
+        self.db.add(agent)
+        await self.db.commit()
+        invalidate_catalog("agents")
+        await self.db.refresh(agent)
+        return agent
+
+    async def update_agent(self, agent: Agent, update_data: dict):
+        if "image_path" in update_data:
+            await AsyncBlobService(self.db).release(agent.image_path)
+        for key, value in update_data.items():
+            setattr(agent, key, value)
+        await self.db.commit()
+        invalidate_catalog("agents")
+        await self.db.refresh(agent)
+        return agent
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import time
+from sqlalchemy import and_, exists, func, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db.models import FileBlob, User, Agent, Plan, Message
+
+BLOB_ROOT = "uploads/blobs"
+
+# Every column that can point at a stored file
+FILE_REFERENCES = [
+    User.profile_picture_path,
+    Agent.image_path,
+    Plan.image_path,
+    Message.file_path,
+]
+
+def blob_path(sha256: str, extension: str = "") -> str:
+    return f"{BLOB_ROOT}/{sha256[:2]}/{sha256}{extension}"
+
+def blob_digest(path: str):
+    """Returns the digest encoded in a blob path, or None for legacy uploads/<category>/ files."""
+    if not path or not path.startswith(BLOB_ROOT + "/"):
+        return None
+    return os.path.splitext(os.path.basename(path))[0]
+
+def _acquire_statement(dialect: str, sha256: str, path: str, size: int):
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(FileBlob).values(sha256=sha256, path=path, size=size, ref_count=1)
+    return stmt.on_conflict_do_update(
+        index_elements=[FileBlob.sha256],
+        set_={"ref_count": FileBlob.ref_count + 1},
+    )
+
+def _release_statement(sha256: str):
+    return (
+        update(FileBlob)
+        .where(FileBlob.sha256 == sha256, FileBlob.ref_count > 0)
+        .values(ref_count=FileBlob.ref_count - 1)
+    )
+
+class BlobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_blob(self, sha256: str):
+        return self.db.query(FileBlob).filter(FileBlob.sha256 == sha256).first()
+
+    def acquire(self, sha256: str, path: str, size: int):
+        """Adds a reference to the blob, creating its row if needed. Does not commit."""
+        self.db.execute(_acquire_statement(self.db.get_bind().dialect.name, sha256, path, size))
+
+    def release(self, path: str):
+        """Drops a reference to the blob behind path, if it is one. Does not commit."""
+        sha256 = blob_digest(path)
+        if sha256 is not None:
+            self.db.execute(_release_statement(sha256))
+
+    def _unreferenced(self):
+        """True for blobs whose path appears in no referencing column (NOT EXISTS over FILE_REFERENCES)."""
+        return and_(*(~exists().where(column == FileBlob.path) for column in FILE_REFERENCES))
+
+    def _referenced_count(self):
+        """Number of referencing rows per blob path, as a subquery (path, count)."""
+        paths = union_all(*(select(column.label("path")).where(column.like(f"{BLOB_ROOT}/%")) for column in FILE_REFERENCES))
+        paths = paths.subquery()
+        return select(paths.c.path, func.count().label("count")).group_by(paths.c.path).subquery()
+
+    def check_ref_counts(self, dry_run: bool = False):
+        """
+        Cross-checks every ref_count against the referencing rows and returns the blobs that
+        disagree as (path, recorded, referenced). Unless dry_run, each is set to the referenced
+        count under its row lock, recounted after locking so a concurrent upload is not lost.
+        """
+        referenced = self._referenced_count()
+        actual = func.coalesce(referenced.c.count, 0)
+        drifted = (
+            self.db.query(FileBlob.sha256, FileBlob.path, FileBlob.ref_count, actual)
+            .outerjoin(referenced, referenced.c.path == FileBlob.path)
+            .filter(FileBlob.ref_count != actual)
+            .all()
+        )
+        self.db.rollback()
+        if dry_run:
+            return [(path, recorded, count) for _, path, recorded, count in drifted]
+
+        fixed = []
+        for sha256, path, _, _ in drifted:
+            blob = self.db.query(FileBlob).filter(FileBlob.sha256 == sha256).with_for_update().first()
+            if blob is None:
+                self.db.rollback()
+                continue
+            count = self.db.execute(select(referenced.c.count).where(referenced.c.path == path)).scalar() or 0
+            if blob.ref_count != count:
+                fixed.append((path, blob.ref_count, count))
+                blob.ref_count = count
+            self.db.commit()
+        return fixed
+
+    def collect_garbage(self, grace_seconds: int = 3600, dry_run: bool = False):
+        """
+        Deletes blobs whose ref_count is 0, and blob files that have no row.
+        Anything younger than grace_seconds is kept, since its upload may not be committed yet.
+        A blob is only deleted when the referencing rows agree with its count (see check_ref_counts).
+        A dry run only reads.
+        """
+        cutoff = time.time() - grace_seconds
+        removed = []
+
+        candidates = (
+            self.db.query(FileBlob.sha256, FileBlob.path, FileBlob.created_at)
+            .filter(FileBlob.ref_count == 0, self._unreferenced())
+            .all()
+        )
+        for sha256, path, created_at in candidates:
+            if created_at is not None and created_at.timestamp() > cutoff:
+                continue
+            if dry_run:
+                removed.append(path)
+                continue
+            # Lock the row, then check again in a new statement. acquire() holds this lock until
+            # the upload's referencing row commits, so a reference added meanwhile is seen here,
+            # and an upload arriving after us waits, then finds the file gone and writes it again.
+            blob = self.db.query(FileBlob).filter(FileBlob.sha256 == sha256).with_for_update().first()
+            still_unreferenced = (
+                self.db.query(FileBlob.sha256)
+                .filter(FileBlob.sha256 == sha256, FileBlob.ref_count == 0, self._unreferenced())
+                .first()
+            )
+            if blob is None or still_unreferenced is None:
+                self.db.rollback()
+                continue
+            if os.path.exists(blob.path):
+                os.remove(blob.path)
+            self.db.delete(blob)
+            self.db.commit()
+            removed.append(path)
+
+        known = {path for (path,) in self.db.query(FileBlob.path).all()}
+        for directory, _, filenames in os.walk(BLOB_ROOT):
+            for filename in filenames:
+                path = f"{directory}/{filename}".replace(os.sep, "/")
+                if path in known or os.path.getmtime(path) > cutoff:
+                    continue
+                removed.append(path)
+                if not dry_run:
+                    os.remove(path)
+
+        self.db.rollback()  # Ends the read transaction; everything deleted is already committed
+        return removed
+
+    def adopt_legacy_files(self, dry_run: bool = False):
+        """
+        Moves files referenced through legacy uploads/<category>/<uuid>_<name> paths into the
+        blob store, pointing every row at the shared blob. Returns the number of rows updated.
+        """
+        updated = 0
+        moved = {}  # legacy path -> (blob path, digest), for rows sharing a legacy file
+        for column in FILE_REFERENCES:
+            model = column.class_
+            rows = (
+                self.db.query(model)
+                .filter(column.isnot(None), column.like("uploads/%"), ~column.like(f"{BLOB_ROOT}/%"))
+                .all()
+            )
+            for row in rows:
+                legacy_path = getattr(row, column.key)
+                if legacy_path not in moved:
+                    if not os.path.isfile(legacy_path):
+                        continue
+                    digest = hashlib.sha256()
+                    with open(legacy_path, "rb") as f:
+                        for chunk in iter(lambda: f.read(64 * 1024), b""):
+                            digest.update(chunk)
+                    sha256 = digest.hexdigest()
+                    blob = self.get_blob(sha256)
+                    path = blob.path if blob else blob_path(sha256, os.path.splitext(legacy_path)[1].lower())
+                    moved[legacy_path] = (path, sha256, os.path.getsize(legacy_path))
+                path, sha256, size = moved[legacy_path]
+                updated += 1
+                if dry_run:
+                    continue
+                # Reference first: the blob row stays locked until the commit, so
+                # collect_garbage cannot remove the file between the move and the commit
+                self.acquire(sha256, path, size)
+                if os.path.exists(legacy_path):
+                    if os.path.exists(path):
+                        os.remove(legacy_path)  # Duplicate of a stored blob
+                    else:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        os.replace(legacy_path, path)
+                setattr(row, column.key, path)
+                self.db.commit()
+        return updated
+
+
+class AsyncBlobService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_blob(self, sha256: str):
+        return await self.db.scalar(select(FileBlob).where(FileBlob.sha256 == sha256))
+
+    async def acquire(self, sha256: str, path: str, size: int):
+        await self.db.execute(_acquire_statement(self.db.get_bind().dialect.name, sha256, path, size))
+
+    async def release(self, path: str):
+        sha256 = blob_digest(path)
+        if sha256 is not None:
+            await self.db.execute(_release_statement(sha256))
@@ -1,21 +1,78 @@
-from sqlalchemy.orm import Session
-from app.db.models import Conversation
+from sqlalchemy import DateTime, func, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased, selectinload
+from app.db.models import Conversation, Message
+from app.services.blob_service import BlobService, AsyncBlobService
+
+INBOX_PREVIEW_LENGTH = 120
+
+def _inbox_query(user_id: int, before_activity, before_id: int, limit: int):
+    if (before_activity is None) != (before_id is None):
+        # Half a cursor would silently return the first page again
+        raise ValueError("before_activity and before_id must be given together")
+    stats = (
+        select(
+            Message.conversation_id.label("conversation_id"),
+            func.count(Message.id).label("message_count"),
+            func.max(Message.id).label("last_message_id"),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Conversation.user_id == user_id)
+        .group_by(Message.conversation_id)
+        .subquery()
+    )
+    last_message = aliased(Message)
+    last_activity = func.coalesce(last_message.sent_at, Conversation.created_at, type_=DateTime(timezone=True))
+    query = (
+        select(
+            Conversation.id,
+            Conversation.created_at,
+            func.coalesce(stats.c.message_count, 0).label("message_count"),
+            func.substr(last_message.content, 1, INBOX_PREVIEW_LENGTH).label("last_message_preview"),
+            last_message.is_systen.label("last_message_is_systen"),
+            last_activity.label("last_activity_at"),
+        )
+        .outerjoin(stats, stats.c.conversation_id == Conversation.id)
+        .outerjoin(last_message, last_message.id == stats.c.last_message_id)
+        .where(Conversation.user_id == user_id)
+    )
+    if before_id is not None:
+        query = query.where(or_(
+            last_activity < before_activity,
+            and_(last_activity == before_activity, Conversation.id < before_id),
+        ))
+    return query.order_by(last_activity.desc(), Conversation.id.desc()).limit(limit)
 
 class ConversationService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_conversations(self):
-        return self.db.query(Conversation).all()
+    def conversations_query(self, after: int = None):
+        """Conversations in id order with their messages, from after `after`; the keyset the admin list pages and streams with."""
+        query = self.db.query(Conversation).options(selectinload(Conversation.messages))
+        if after is not None:
+            query = query.filter(Conversation.id > after)
+        return query.order_by(Conversation.id)
+
+    def get_conversations(self, after: int = None, limit: int = None):
+        return self.conversations_query(after=after).limit(limit).all()
     
     def get_conversations_by_user(self, user_id: int):
         return (
             self.db.query(Conversation)
+            .options(selectinload(Conversation.messages))
             .filter(Conversation.user_id == user_id)
             .order_by(Conversation.created_at.desc())
             .all()
         )
 
+    def get_inbox(self, user_id: int, before_activity=None, before_id: int = None, limit: int = 20):
+        """
+        One row per conversation with its message count and last message, in a single query,
+        newest activity first. (before_activity, before_id) is the cursor of the previous page.
+        """
+        return self.db.execute(_inbox_query(user_id, before_activity, before_id, limit)).all()
+
     def get_conversation(self, conversation_id: int):
         return self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
 
@@ -34,5 +91,52 @@ class ConversationService:
         return conversation
 
     def delete_conversation(self, conversation: Conversation):
+        blobs = BlobService(self.db)
+        for message in conversation.messages:
+            blobs.release(message.file_path)
         self.db.delete(conversation)
-        self.db.commit()
\ No newline at end of file
+        self.db.commit()
+
+
+class AsyncConversationService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_conversations(self):
+        return (await self.db.scalars(select(Conversation).options(selectinload(Conversation.messages)))).all()
+
+    async def get_conversations_by_user(self, user_id: int):
+        return (await self.db.scalars(
+            select(Conversation)
+            .options(selectinload(Conversation.messages))
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.created_at.desc())
+        )).all()
+
+    async def get_inbox(self, user_id: int, before_activity=None, before_id: int = None, limit: int = 20):
+        return (await self.db.execute(_inbox_query(user_id, before_activity, before_id, limit))).all()
+
+    async def get_conversation(self, conversation_id: int):
+        return await self.db.scalar(select(Conversation).where(Conversation.id == conversation_id))
+
+    async def create_conversation(self, conversation_data: dict):
+        conversation = Conversation(**conversation_data)
+        self.db.add(conversation)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        return conversation
+
+    async def update_conversation(self, conversation: Conversation, update_data: dict):
+        for key, value in update_data.items():
+            setattr(conversation, key, value)
+        await self.db.commit()
+        await self.db.refresh(conversation)
+        return conversation
+
+    async def delete_conversation(self, conversation: Conversation):
+        await self.db.refresh(conversation, attribute_names=["messages"])  # Loaded up front for the cascade
+        blobs = AsyncBlobService(self.db)
+        for message in conversation.messages:
+            await blobs.release(message.file_path)
+        await self.db.delete(conversation)
+        await self.db.commit()
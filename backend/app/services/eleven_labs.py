@@ -1,8 +1,26 @@
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.models import Conversation
-from app.services.message_service import MessageService
+from app.services.message_service import MessageService, AsyncMessageService
 from app.services.conversation_service import ConversationService
 
+def _transcript_turns(transcript_list: list):
+    return [
+        {"content": msg["message"], "is_systen": msg["role"].lower() != "user"}
+        for msg in transcript_list
+        if msg.get("message") and msg.get("role")  # Skip empty messages
+    ]
+
+def _import_result(conversation_id: int, message_ids: list, started: float):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[ElevenLabs] Imported {len(message_ids)} turns into conversation {conversation_id} in {elapsed_ms:.1f} ms")
+    return {
+        "conversation_id": conversation_id,
+        "message_count": len(message_ids),
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
+
 class ElevenLabsService:
     def __init__(self, db: Session):
         self.db = db
@@ -11,27 +29,45 @@ class ElevenLabsService:
 
 
     def import_transcript_as_conversation(self, user_id: int, transcript_list: list):
-        # Step 1: Create a new conversation
-        conversation = Conversation(user_id=user_id)
-        self.db.add(conversation)
-        self.db.commit()
-        self.db.refresh(conversation)
-
-        # Step 2: Add each message
-        for msg in transcript_list:
-            if not msg.get("message") or not msg.get("role"):
-                continue  # Skip empty messages
-
-            self.message_service.create_message(
-                user_id=user_id,
-                content=msg['message'],
-                is_systen=(msg['role'].lower() != 'user'),
-                conversation_id=conversation.id
-            )
-
-        
-        # Step 3: Return the conversation with the messages
-        newly_created_conversation = self.conversation_service.get_conversation(conversation.id)
-        return newly_created_conversation
-
-    
\ No newline at end of file
+        """
+        Imports the conversation and all of its turns in a single transaction.
+        Returns the new conversation id, the number of imported turns and the time it took.
+        """
+        started = time.perf_counter()
+        turns = _transcript_turns(transcript_list)
+
+        try:
+            conversation = Conversation(user_id=user_id)
+            self.db.add(conversation)
+            self.db.flush()  # Assigns conversation.id without committing
+            message_ids = self.message_service.bulk_create_messages(conversation.id, turns)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return _import_result(conversation.id, message_ids, started)
+
+
+class AsyncElevenLabsService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.message_service = AsyncMessageService(db)
+
+    async def import_transcript_as_conversation(self, user_id: int, transcript_list: list):
+        """Same single-transaction import as ElevenLabsService, without blocking the event loop."""
+        started = time.perf_counter()
+        turns = _transcript_turns(transcript_list)
+
+        try:
+            conversation = Conversation(user_id=user_id)
+            self.db.add(conversation)
+            await self.db.flush()
+            conversation_id = conversation.id
+            message_ids = await self.message_service.bulk_create_messages(conversation_id, turns)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        return _import_result(conversation_id, message_ids, started)
@@ -1,5 +1,19 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from app.db.models import Message, Conversation
+from app.services.blob_service import BlobService, AsyncBlobService
+
+def _bulk_rows(conversation_id: int, messages: list):
+    return [
+        {
+            "conversation_id": conversation_id,
+            "is_systen": msg.get("is_systen", False),
+            "content": msg["content"],
+            "file_path": msg.get("file_path"),
+        }
+        for msg in messages
+    ]
 
 class MessageService:
     def __init__(self, db: Session):
@@ -11,8 +25,20 @@ class MessageService:
     def get_message(self, message_id: int):
         return self.db.query(Message).filter(Message.id == message_id).first()
     
-    def get_messages_by_conversation(self, conversation_id: int):
-        return self.db.query(Message).filter(Message.conversation_id == conversation_id).all()
+    def get_messages_by_conversation(self, conversation_id: int, before: int = None, after: int = None, limit: int = None):
+        # Keyset pagination on (conversation_id, id): each page is one index range scan
+        query = self.db.query(Message).filter(Message.conversation_id == conversation_id)
+        if before is not None:
+            query = query.filter(Message.id < before)
+        if after is not None:
+            query = query.filter(Message.id > after)
+        if limit is None or after is not None:
+            query = query.order_by(Message.id.asc())
+            return query.limit(limit).all() if limit else query.all()
+        # Without an "after" cursor the page is the newest messages, still returned oldest first
+        messages = query.order_by(Message.id.desc()).limit(limit).all()
+        messages.reverse()
+        return messages
 
     def create_message(self, user_id: int, content: str, is_systen: bool = False, file_path: str = None, conversation_id: int = None):
         # If conversation_id is not provided, create a new conversation
@@ -35,7 +61,20 @@ class MessageService:
         self.db.refresh(message)
         return message
 
+    def bulk_create_messages(self, conversation_id: int, messages: list):
+        """
+        Inserts all messages with a multi-row INSERT ... RETURNING, keeping their order.
+        Does not commit, so the caller controls the transaction.
+        """
+        if not messages:
+            return []
+        rows = _bulk_rows(conversation_id, messages)
+        result = self.db.execute(insert(Message).returning(Message.id, sort_by_parameter_order=True), rows)
+        return result.scalars().all()
+
     def update_message(self, message: Message, update_data: dict):
+        if "file_path" in update_data and update_data["file_path"] != message.file_path:
+            BlobService(self.db).release(message.file_path)
         for key, value in update_data.items():
             setattr(message, key, value)
         self.db.commit()
@@ -43,5 +82,76 @@ class MessageService:
         return message
 
     def delete_message(self, message: Message):
+        BlobService(self.db).release(message.file_path)
         self.db.delete(message)
-        self.db.commit()
\ No newline at end of file
+        self.db.commit()
+
+
+class AsyncMessageService:
+    """MessageService for async routes; loads Message.conversation eagerly since async sessions cannot lazy-load."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_message(self, message_id: int):
+        return await self.db.scalar(
+            select(Message).options(selectinload(Message.conversation)).where(Message.id == message_id)
+        )
+
+    async def get_messages_by_conversation(self, conversation_id: int, before: int = None, after: int = None, limit: int = None):
+        query = (
+            select(Message)
+            .options(selectinload(Message.conversation))
+            .where(Message.conversation_id == conversation_id)
+        )
+        if before is not None:
+            query = query.where(Message.id < before)
+        if after is not None:
+            query = query.where(Message.id > after)
+        if limit is None or after is not None:
+            query = query.order_by(Message.id.asc()).limit(limit)
+            return (await self.db.scalars(query)).all()
+        messages = (await self.db.scalars(query.order_by(Message.id.desc()).limit(limit))).all()
+        return list(reversed(messages))
+
+    async def create_message(self, user_id: int, content: str, is_systen: bool = False, file_path: str = None, conversation_id: int = None):
+        if conversation_id is None:
+            conversation = Conversation(user_id=user_id)
+            self.db.add(conversation)
+            await self.db.flush()
+            conversation_id = conversation.id
+
+        message = Message(
+            conversation_id=conversation_id,
+            is_systen=is_systen,
+            content=content,
+            file_path=file_path
+        )
+        self.db.add(message)
+        await self.db.commit()
+        return await self.db.scalar(
+            select(Message)
+            .options(selectinload(Message.conversation))
+            .where(Message.id == message.id)
+            .execution_options(populate_existing=True)
+        )
+
+    async def bulk_create_messages(self, conversation_id: int, messages: list):
+        if not messages:
+            return []
+        rows = _bulk_rows(conversation_id, messages)
+        result = await self.db.execute(insert(Message).returning(Message.id, sort_by_parameter_order=True), rows)
+        return result.scalars().all()
+
+    async def update_message(self, message: Message, update_data: dict):
+        if "file_path" in update_data and update_data["file_path"] != message.file_path:
+            await AsyncBlobService(self.db).release(message.file_path)
+        for key, value in update_data.items():
+            setattr(message, key, value)
+        await self.db.commit()
+        return message
+
+    async def delete_message(self, message: Message):
+        await AsyncBlobService(self.db).release(message.file_path)
+        await self.db.delete(message)
+        await self.db.commit()
@@ -1,21 +1,33 @@
 from sqlalchemy.orm import Session
 from app.db.models import Payment, Subscription
+from app.services.subscription_service import SubscriptionService
 
 class PaymentService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_payments(self):
-        return self.db.query(Payment).all()
+    def payments_query(self, user_id: int = None, subscription_id: int = None, after: int = None):
+        """Payments in id order, from after `after`; the keyset the list endpoints page and stream with."""
+        query = self.db.query(Payment)
+        if user_id is not None:
+            query = query.filter(Payment.user_id == user_id)
+        if subscription_id is not None:
+            query = query.filter(Payment.subscription_id == subscription_id)
+        if after is not None:
+            query = query.filter(Payment.id > after)
+        return query.order_by(Payment.id)
+
+    def get_payments(self, after: int = None, limit: int = None):
+        return self.payments_query(after=after).limit(limit).all()
     
-    def get_payments_by_user(self, user_id: int):
-        return self.db.query(Payment).filter(Payment.user_id == user_id).all()
+    def get_payments_by_user(self, user_id: int, after: int = None, limit: int = None):
+        return self.payments_query(user_id=user_id, after=after).limit(limit).all()
 
     def get_payment(self, payment_id: int):
         return self.db.query(Payment).filter(Payment.id == payment_id).first()
 
-    def get_payments_by_subscription(self, subscription_id: int):
-        return self.db.query(Payment).filter(Payment.subscription_id == subscription_id).all()
+    def get_payments_by_subscription(self, subscription_id: int, after: int = None, limit: int = None):
+        return self.payments_query(subscription_id=subscription_id, after=after).limit(limit).all()
 
     def create_payment(self, payment_data: dict):
         subscription_id = payment_data.get("subscription_id")
@@ -31,20 +43,16 @@ class PaymentService:
         if not subscription:
             if not user_id or not plan_id:
                 raise ValueError("user_id and plan_id are required to create a subscription.")
-            subscription = Subscription(
-                user_id=user_id,
-                plan_id=plan_id,
-                status="active"
-            )
-            self.db.add(subscription)
-            self.db.commit()
-            self.db.refresh(subscription)
+            # Goes through SubscriptionService so the user's previous active subscription is swapped out
+            subscription = SubscriptionService(self.db).create_subscription({
+                "user_id": user_id,
+                "plan_id": plan_id,
+                "status": "active",
+            })
             payment_data["subscription_id"] = subscription.id
         else:
             # If subscription exists, activate it
-            subscription.status = "active"
-            self.db.add(subscription)
-            self.db.commit()
+            SubscriptionService(self.db).update_subscription(subscription, {"status": "active"})
 
         # Remove plan_id before creating Payment
         payment_data.pop("plan_id", None)
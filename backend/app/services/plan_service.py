@@ -1,5 +1,9 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.models import Plan
+from app.services.blob_service import BlobService, AsyncBlobService
+from app.core.catalog import invalidate_catalog
 
 class PlanService:
     def __init__(self, db: Session):
@@ -18,16 +22,49 @@ class PlanService:
         plan = Plan(**plan_data)
         self.db.add(plan)
         self.db.commit()
+        invalidate_catalog("plans")
         self.db.refresh(plan)
         return plan
 
     def update_plan(self, plan: Plan, update_data: dict):
+        # save_upload added a reference for the new path, even when it is the same blob
+        if "image_path" in update_data:
+            BlobService(self.db).release(plan.image_path)
         for key, value in update_data.items():
             setattr(plan, key, value)
         self.db.commit()
+        invalidate_catalog("plans")
         self.db.refresh(plan)
         return plan
 
     def delete_plan(self, plan: Plan):
+        BlobService(self.db).release(plan.image_path)
         self.db.delete(plan)
-        self.db.commit()
\ No newline at end of file
+        self.db.commit()
+        invalidate_catalog("plans")
+
+
+class AsyncPlanService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_plan(self, plan_id: int):
+        return await self.db.scalar(select(Plan).where(Plan.id == plan_id))
+
+    async def create_plan(self, plan_data: dict):
+        plan = Plan(**plan_data)
+        self.db.add(plan)
+        await self.db.commit()
+        invalidate_catalog("plans")
+        await self.db.refresh(plan)
+        return plan
+
+    async def update_plan(self, plan: Plan, update_data: dict):
+        if "image_path" in update_data:
+            await AsyncBlobService(self.db).release(plan.image_path)
+        for key, value in update_data.items():
+            setattr(plan, key, value)
+        await self.db.commit()
+        invalidate_catalog("plans")
+        await self.db.refresh(plan)
+        return plan
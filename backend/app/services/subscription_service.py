@@ -1,28 +1,45 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from app.db.models import Subscription
 
+# Loader options per response model, so serialising never lazy-loads row by row.
+# selectinload rather than joinedload: agents and payments are both collections, and
+# joining them would multiply the rows (agents x payments) for every subscription.
+SUBSCRIPTION_LOAD = (selectinload(Subscription.agents),)  # schemas.subscription.Subscription
+SUBSCRIPTION_WITH_PAYMENTS_LOAD = SUBSCRIPTION_LOAD + (selectinload(Subscription.payments),)  # SubscriptionWithPayments
+
 class SubscriptionService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_subscriptions(self):
-        return self.db.query(Subscription).all()
+    def subscriptions_query(self, active_only: bool = False, after: int = None):
+        """Subscriptions in id order with their agents, from after `after`; the keyset the admin lists page and stream with."""
+        query = self.db.query(Subscription).options(*SUBSCRIPTION_LOAD)
+        if active_only:
+            query = query.filter(Subscription.status == "active")
+        if after is not None:
+            query = query.filter(Subscription.id > after)
+        return query.order_by(Subscription.id)
+
+    def get_subscriptions(self, after: int = None, limit: int = None):
+        return self.subscriptions_query(after=after).limit(limit).all()
     
-    def get_active_subscriptions(self):
-        return self.db.query(Subscription).filter(Subscription.status == "active").all()
+    def get_active_subscriptions(self, after: int = None, limit: int = None):
+        return self.subscriptions_query(active_only=True, after=after).limit(limit).all()
     
     def get_subscriptions_by_user(self, user_id: int):
-        return self.db.query(Subscription).filter(Subscription.user_id == user_id).all()
+        return self.db.query(Subscription).options(*SUBSCRIPTION_LOAD).filter(Subscription.user_id == user_id).all()
     
     def get_active_subscriptions_by_user(self, user_id: int):
+        # uq_subscriptions_user_id_active guarantees at most one row, so no sort is needed
         subscription = (
             self.db.query(Subscription)
+            .options(*SUBSCRIPTION_LOAD)
             .filter(
                 Subscription.user_id == user_id,
                 Subscription.status == "active"
             )
-            .order_by(Subscription.created_at.desc())
-            .first()
+            .one_or_none()
         )
         return [subscription] if subscription else []
     
@@ -30,37 +47,65 @@ class SubscriptionService:
     def get_subscription(self, subscription_id: int):
         return self.db.query(Subscription).filter(Subscription.id == subscription_id).first()
 
+    def get_subscription_with_payments(self, subscription_id: int):
+        """For the SubscriptionWithPayments response: the subscription, its agents and its payments in three queries."""
+        return (
+            self.db.query(Subscription)
+            .options(*SUBSCRIPTION_WITH_PAYMENTS_LOAD)
+            .filter(Subscription.id == subscription_id)
+            .first()
+        )
+
+    def _deactivate_active(self, user_id: int, keep_id: int = None):
+        # The user's current active subscription, found through the partial unique index
+        query = self.db.query(Subscription).filter(
+            Subscription.user_id == user_id,
+            Subscription.status == "active"
+        )
+        if keep_id is not None:
+            query = query.filter(Subscription.id != keep_id)
+        query.update({"status": "inactive"}, synchronize_session=False)
+
+    def _commit_swap(self, apply):
+        """
+        Runs apply() (deactivate the old subscription, activate the new one) and commits both together.
+        A concurrent activation for the same user makes the unique index reject ours; it is then
+        retried once on a fresh snapshot, so the last activation wins as before.
+        """
+        for attempt in range(2):
+            result = apply()
+            try:
+                self.db.commit()
+                return result
+            except IntegrityError:
+                self.db.rollback()
+                if attempt:
+                    raise
+
     def create_subscription(self, subscription_data: dict):
-        # If the new subscription is active, set all previous subscriptions for the user to inactive
-        if subscription_data.get("status", "active") == "active":
-            self.db.query(Subscription).filter(
-                Subscription.user_id == subscription_data["user_id"],
-                Subscription.status == "active"
-            ).update({"status": "inactive"})
-            self.db.flush()  # Ensure the update is applied before insert
+        def apply():
+            if subscription_data.get("status", "active") == "active":
+                self._deactivate_active(subscription_data["user_id"])
+            subscription = Subscription(**subscription_data)
+            self.db.add(subscription)
+            return subscription
 
-        subscription = Subscription(**subscription_data)
-        self.db.add(subscription)
-        self.db.commit()
+        subscription = self._commit_swap(apply)
         self.db.refresh(subscription)
         return subscription
 
     def update_subscription(self, subscription: Subscription, update_data: dict):
-         # If status is being set to active, deactivate other active subscriptions for this user
-        if update_data.get("status") == "active":
-            self.db.query(Subscription).filter(
-                Subscription.user_id == subscription.user_id,
-                Subscription.status == "active",
-                Subscription.id != subscription.id
-            ).update({"status": "inactive"})
-            self.db.flush()
+        def apply():
+            if update_data.get("status") == "active":
+                self._deactivate_active(subscription.user_id, keep_id=subscription.id)
+            for key, value in update_data.items():
+                setattr(subscription, key, value)
+            return subscription
 
-        for key, value in update_data.items():
-            setattr(subscription, key, value)
-        self.db.commit()
+        self._commit_swap(apply)
         self.db.refresh(subscription)
         return subscription
 
     def delete_subscription(self, subscription: Subscription):
         self.db.delete(subscription)
-        self.db.commit()
\ No newline at end of file
+        self.db.commit()
@@ -1,18 +1,29 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db.models import User
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services.blob_service import BlobService, AsyncBlobService
+from app.core.auth_cache import invalidate_principal, evict_subject
+from app.core.password_hasher import password_hasher
 
 class UserService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_users(self):
-            return self.db.query(User).all()
+    def users_query(self, active_only: bool = False, after: int = None):
+        """Users in id order, from after `after`; the keyset the list endpoints page and stream with."""
+        query = self.db.query(User)
+        if active_only:
+            query = query.filter(User.is_active == True)
+        if after is not None:
+            query = query.filter(User.id > after)
+        return query.order_by(User.id)
+
+    def get_users(self, after: int = None, limit: int = None):
+        return self.users_query(after=after).limit(limit).all()
     
-    def get_active_users(self):
-        return self.db.query(User).filter(User.is_active == True).all()
+    def get_active_users(self, after: int = None, limit: int = None):
+        return self.users_query(active_only=True, after=after).limit(limit).all()
 
     def get_user_by_email(self, email: str):
         return self.db.query(User).filter(User.email == email).first()
@@ -21,7 +32,7 @@ class UserService:
         return self.db.query(User).filter(User.id == user_id).first()
 
     def create_user(self, email: str, password: str, **kwargs):
-        hashed_password = pwd_context.hash(password)
+        hashed_password = password_hasher.hash_sync(password)
         user = User(email=email, password_hash=hashed_password, **kwargs)
         self.db.add(user)
         self.db.commit()
@@ -30,19 +41,73 @@ class UserService:
 
     def authenticate_user(self, email: str, password: str):
         user = self.get_user_by_email(email)
-        if not user or not pwd_context.verify(password, user.password_hash):
+        if not user or not password_hasher.verify_sync(password, user.password_hash):
             return None
         return user
 
     def change_password(self, user: User, new_password: str):
-        user.password_hash = pwd_context.hash(new_password)
+        user.password_hash = password_hasher.hash_sync(new_password)
         self.db.commit()
+        evict_subject(user.email)
         self.db.refresh(user)
         return user
 
     def update_profile(self, user: User, **kwargs):
+        # save_upload added a reference for the new path, even when it is the same blob
+        if "profile_picture_path" in kwargs:
+            BlobService(self.db).release(user.profile_picture_path)
         for key, value in kwargs.items():
             setattr(user, key, value)
         self.db.commit()
+        invalidate_principal(user.email)
         self.db.refresh(user)
-        return user
\ No newline at end of file
+        return user
+
+
+class AsyncUserService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user_by_email(self, email: str):
+        return await self.db.scalar(select(User).where(User.email == email))
+
+    async def get_user_by_id(self, user_id: int):
+        return await self.db.scalar(select(User).where(User.id == user_id))
+
+    async def create_user(self, email: str, password: str, **kwargs):
+        hashed_password = await password_hasher.hash(password)
+        user = User(email=email, password_hash=hashed_password, **kwargs)
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def authenticate_user(self, email: str, password: str):
+        user = await self.get_user_by_email(email)
+        if not user:
+            return None
+        valid, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+        if not valid:
+            return None
+        if new_hash:
+            # Stored with another bcrypt cost, upgrade it now that we know the password
+            user.password_hash = new_hash
+            await self.db.commit()
+        return user
+
+    async def change_password(self, user: User, new_password: str):
+        user.password_hash = await password_hasher.hash(new_password)
+        await self.db.commit()
+        evict_subject(user.email)
+        await self.db.refresh(user)
+        return user
+
+    async def update_profile(self, user: User, **kwargs):
+        if "profile_picture_path" in kwargs:
+            await AsyncBlobService(self.db).release(user.profile_picture_path)
+        for key, value in kwargs.items():
+            setattr(user, key, value)
+        await self.db.commit()
+        invalidate_principal(user.email)
+        await self.db.refresh(user)
+        return user
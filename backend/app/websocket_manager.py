@@ -1,24 +1,357 @@
+import asyncio
+import hashlib
+import json
+import time
+from uuid import uuid4
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from typing import Awaitable, Callable, Dict, Optional, Set, Union
+from app.core.config import settings
+from app.core.metrics import GaugeFunc, registry, ws_evictions, ws_fanout
 
-class WebSocketManager:
+Deliver = Callable[[str, str], Awaitable[None]]
+
+class InMemoryBroadcastBackend:
+    """Single-process backend: publishing delivers straight to this worker's sockets."""
+
+    def bind(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, room: str):
+        pass
+
+    async def unsubscribe(self, room: str):
+        pass
+
+    async def publish(self, room: str, message: str):
+        await self.deliver(room, message)
+
+class PostgresBroadcastBackend:
+    """
+    Fans broadcasts out to every worker through PostgreSQL LISTEN/NOTIFY.
+    A worker only LISTENs on the rooms it holds sockets for, and delivers its
+    own broadcasts locally without waiting for the round trip.
+    If the LISTEN connection drops it is reopened and every room is LISTENed on again;
+    other workers' broadcasts sent while it was down are lost.
+    """
+
+    # NOTIFY payloads are capped at 8000 bytes, larger messages are sent in parts
+    PART_CHARS = 1000
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.origin = uuid4().hex
+        self.listen_conn = None
+        self.publish_pool = None
+        self.listen_lock = asyncio.Lock()
+        self.channels: Dict[str, str] = {}  # channel -> room
+        self.partial: Dict[tuple, list] = {}
+        self.tasks: Set[asyncio.Task] = set()  # Strong references until done
+        self.stopping = False
+
+    def bind(self, deliver: Deliver):
+        self.deliver = deliver
+
+    @staticmethod
+    def channel(room: str) -> str:
+        # Channel names are identifiers (max 63 bytes), room names are arbitrary
+        return "ws_" + hashlib.sha1(room.encode("utf-8")).hexdigest()
+
+    async def start(self):
+        import asyncpg
+
+        self.stopping = False
+        self.listen_conn = await asyncpg.connect(self.dsn)
+        self.listen_conn.add_termination_listener(self._on_terminated)
+        self.publish_pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+
+    async def stop(self):
+        self.stopping = True
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.listen_conn is not None:
+            await self.listen_conn.close()
+        if self.publish_pool is not None:
+            await self.publish_pool.close()
+
+    def _listening(self) -> bool:
+        return self.listen_conn is not None and not self.listen_conn.is_closed()
+
+    async def subscribe(self, room: str):
+        channel = self.channel(room)
+        async with self.listen_lock:
+            if channel not in self.channels:
+                self.channels[channel] = room
+                if self._listening():
+                    await self.listen_conn.add_listener(channel, self._on_notify)
+
+    async def unsubscribe(self, room: str):
+        channel = self.channel(room)
+        async with self.listen_lock:
+            if self.channels.pop(channel, None) is not None and self._listening():
+                await self.listen_conn.remove_listener(channel, self._on_notify)
+
+    def _on_terminated(self, connection):
+        if self.stopping or connection is not self.listen_conn:
+            return
+        print("[ws] LISTEN connection lost, reconnecting")
+        self._spawn(self._reconnect())
+
+    async def _reconnect(self):
+        import asyncpg
+
+        delay = 0.5
+        while not self.stopping:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+            except Exception as exc:
+                print(f"[ws] LISTEN reconnect failed, retrying in {delay}s: {exc!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            try:
+                async with self.listen_lock:
+                    self.partial.clear()  # Parts of messages cut by the outage never complete
+                    for channel in self.channels:
+                        await connection.add_listener(channel, self._on_notify)
+                    self.listen_conn = connection
+                    connection.add_termination_listener(self._on_terminated)
+            except Exception as exc:
+                print(f"[ws] LISTEN reconnect failed, retrying in {delay}s: {exc!r}")
+                connection.terminate()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            print(f"[ws] LISTEN connection restored, {len(self.channels)} room(s)")
+            return
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[ws] Pub/sub task failed: {task.exception()!r}")
+
+    async def publish(self, room: str, message: str):
+        await self.deliver(room, message)
+        message_id = uuid4().hex
+        parts = [message[i:i + self.PART_CHARS] for i in range(0, len(message), self.PART_CHARS)] or [""]
+        channel = self.channel(room)
+        async with self.publish_pool.acquire() as conn:
+            # One transaction, so the parts are delivered together and in order
+            async with conn.transaction():
+                for index, part in enumerate(parts):
+                    payload = json.dumps(
+                        {"o": self.origin, "i": message_id, "n": len(parts), "k": index, "m": part},
+                        ensure_ascii=False,
+                    )
+                    await conn.execute("SELECT pg_notify($1, $2)", channel, payload)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        envelope = json.loads(payload)
+        room = self.channels.get(channel)
+        if envelope["o"] == self.origin or room is None:
+            return
+        key = (envelope["o"], envelope["i"])
+        parts = self.partial.setdefault(key, [None] * envelope["n"])
+        parts[envelope["k"]] = envelope["m"]
+        if any(part is None for part in parts):
+            return
+        del self.partial[key]
+        self._spawn(self.deliver(room, "".join(parts)))
+
+def create_backend():
+    if settings.WS_BACKEND == "postgres":
+        dsn = settings.WS_PUBSUB_DSN or settings.DATABASE_URL.replace("+psycopg2", "")
+        return PostgresBroadcastBackend(dsn)
+    return InMemoryBroadcastBackend()
+
+class FanoutStats:
     def __init__(self):
-        self.rooms: Dict[str, Set[WebSocket]] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.evicted = 0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "fanouts": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "last_ms": round(self.last * 1000, 2),
+            "evicted": self.evicted,
+        }
+
+class Fanout:
+    """One broadcast to one room; its latency is recorded when the last socket has sent it."""
+
+    def __init__(self, room: str, message: str, pending: int, stats: FanoutStats):
+        self.room = room
+        self.message = message
+        self.pending = pending
+        self.started = time.perf_counter()
+        self.stats = stats
+
+    def done(self):
+        self.pending -= 1
+        if self.pending == 0:
+            elapsed = time.perf_counter() - self.started
+            self.stats.observe(elapsed)
+            ws_fanout.observe((), elapsed)
+
+class Connection:
+    """A socket with its own bounded outbound queue, drained by a dedicated writer task."""
+
+    def __init__(self, websocket: WebSocket, room: str, manager: "WebSocketManager"):
+        self.websocket = websocket
+        self.room = room
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.over_high_water_since: Optional[float] = None
+        self.writer = asyncio.create_task(self._drain())
+
+    def offer(self, fanout: Fanout) -> bool:
+        """Queues the message; False means this client is too slow and should be evicted."""
+        try:
+            self.queue.put_nowait(fanout)
+        except asyncio.QueueFull:
+            fanout.done()
+            return False
+        if self.queue.qsize() < settings.WS_HIGH_WATER:
+            self.over_high_water_since = None
+            return True
+        now = time.monotonic()
+        if self.over_high_water_since is None:
+            self.over_high_water_since = now
+        return now - self.over_high_water_since < settings.WS_SLOW_CLIENT_SECONDS
+
+    async def _drain(self):
+        while True:
+            fanout = await self.queue.get()
+            try:
+                await self.websocket.send_text(fanout.message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.manager._spawn(self.manager.evict(self))  # Dead socket, stop writing to it
+                return
+            finally:
+                fanout.done()
+
+    def discard(self):
+        self.writer.cancel()
+        while not self.queue.empty():
+            self.queue.get_nowait().done()
+
+    async def close(self):
+        self.discard()
+        try:
+            await asyncio.wait_for(self.websocket.close(), timeout=1.0)
+        except Exception:
+            pass
+
+class WebSocketManager:
+    def __init__(self, backend=None):
+        self.rooms: Dict[str, Dict[WebSocket, Connection]] = {}
+        self.stats: Dict[str, FanoutStats] = {}  # Rooms with local sockets only
+        self.evicted = 0
+        self.tasks: Set[asyncio.Task] = set()  # Pending evictions, strong references until done
+        self.backend = backend or InMemoryBroadcastBackend()
+        self.backend.bind(self._deliver)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for connections in list(self.rooms.values()):
+            for connection in list(connections.values()):
+                await connection.close()
+        self.rooms = {}
+        await self.backend.stop()
 
     async def connect(self, websocket: WebSocket, room: str):
         await websocket.accept()
         if room not in self.rooms:
-            self.rooms[room] = set()
-        self.rooms[room].add(websocket)
+            self.rooms[room] = {}
+            self.stats.setdefault(room, FanoutStats())
+            await self.backend.subscribe(room)
+        self.rooms[room][websocket] = Connection(websocket, room, self)
 
-    def disconnect(self, websocket: WebSocket, room: str):
+    async def disconnect(self, websocket: WebSocket, room: str):
         if room in self.rooms:
-            self.rooms[room].discard(websocket)
+            connection = self.rooms[room].pop(websocket, None)
+            if connection is not None:
+                connection.discard()
             if not self.rooms[room]:
                 del self.rooms[room]
+                self.stats.pop(room, None)
+                await self.backend.unsubscribe(room)
+
+    async def evict(self, connection: Connection):
+        if self.rooms.get(connection.room, {}).get(connection.websocket) is not connection:
+            return
+        self.evicted += 1
+        self.stats[connection.room].evicted += 1
+        ws_evictions.inc()
+        await self.disconnect(connection.websocket, connection.room)
+        await connection.close()
+
+    async def broadcast(self, room: str, message: Union[str, dict]):
+        if not isinstance(message, str):
+            message = json.dumps(message)  # Encoded once, shared by every socket's queue
+        await self.backend.publish(room, message)
+
+    async def _deliver(self, room: str, message: str):
+        connections = list(self.rooms.get(room, {}).values())
+        if not connections:
+            return
+        fanout = Fanout(room, message, len(connections), self.stats[room])
+        for connection in connections:
+            if not connection.offer(fanout):
+                self._spawn(self.evict(connection))
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[ws] Eviction failed: {task.exception()!r}")
+
+    def get_stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "connections": sum(len(connections) for connections in self.rooms.values()),
+            "evicted": self.evicted,
+            "per_room": {
+                room: {"connections": len(self.rooms.get(room, {})), **stats.as_dict()}
+                for room, stats in self.stats.items()
+            },
+        }
 
-    async def broadcast(self, room: str, message: str):
-        for ws in self.rooms.get(room, set()):
-            await ws.send_text(message)
+ws_manager = WebSocketManager(create_backend())
 
-ws_manager = WebSocketManager()
\ No newline at end of file
+registry.register(GaugeFunc(
+    "friday_ws_connections", "Open websocket connections on this worker.",
+    lambda: sum(len(connections) for connections in ws_manager.rooms.values())))
@@ -0,0 +1,76 @@
+"""
+Signed ElevenLabs post-call webhooks, using the same "t=<timestamp>,v0=<hmac>" scheme
+that POST /webhook/eleven checks.
+
+    cd backend
+    python -m benchmarks.elevenlabs_webhook --url http://127.0.0.1:8000/webhook/eleven \\
+        --secret $ELEVENLABS_WEBHOOK_SECRET --user-id 1 [--turns 12]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional
+from uuid import uuid4
+
+LINES = [
+    ("agent", "Hi, thanks for calling. How can I help you today?"),
+    ("user", "I'd like to move my appointment to next week if that's possible."),
+    ("agent", "Of course. Which day works best for you?"),
+    ("user", "Tuesday afternoon, ideally around three."),
+    ("agent", "Tuesday at three is free. Shall I book it?"),
+    ("user", "Yes please, and send me a confirmation by email."),
+]
+
+
+def sign(body: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Value of the elevenlabs-signature header for this body."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v0={digest}"
+
+
+def transcript_payload(user_id: int, user_email: str = "", turns: int = 12, agent_id: str = "agent_load") -> dict:
+    transcript = [{"role": role, "message": message} for role, message in (LINES * turns)[:turns]]
+    return {
+        "type": "post_call_transcription",
+        "event_timestamp": int(time.time()),
+        "data": {
+            "agent_id": agent_id,
+            "conversation_id": f"conv_{uuid4().hex}",
+            "status": "done",
+            "transcript": transcript,
+            "metadata": {"start_time_unix_secs": int(time.time()) - 60, "call_duration_secs": 60, "cost": 120},
+            "analysis": {"call_successful": "success", "transcript_summary": "The caller moved an appointment."},
+            "conversation_initiation_client_data": {
+                "dynamic_variables": {"user_id": user_id, "user_email": user_email},
+            },
+        },
+    }
+
+
+def signed_request(payload: dict, secret: str):
+    """(body, headers) ready to POST to /webhook/eleven."""
+    body = json.dumps(payload).encode("utf-8")
+    return body, {"content-type": "application/json", "elevenlabs-signature": sign(body, secret)}
+
+
+def main():
+    import httpx
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.elevenlabs_webhook")
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--user-email", default="")
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+
+    body, headers = signed_request(transcript_payload(args.user_id, args.user_email, args.turns), args.secret)
+    response = httpx.post(args.url, content=body, headers=headers)
+    print(response.status_code, response.text)
+
+
+if __name__ == "__main__":
+    main()
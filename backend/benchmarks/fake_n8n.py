@@ -0,0 +1,70 @@
+"""
+Stand-in for the n8n agent webhooks: every POST waits `latency` and answers with a
+`reply_bytes` long text reply, the way an agent workflow answers /messages.
+
+    cd backend
+    python -m benchmarks.fake_n8n [--port 5679] [--latency-ms 800] [--jitter-ms 200] [--reply-bytes 600]
+
+Point an agent's link at http://127.0.0.1:5679/webhook/<anything>.
+"""
+import argparse
+import asyncio
+import random
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+WORDS = "sure here is what I found for you about your question and the next steps".split()
+
+
+def reply_text(size: int) -> str:
+    text = []
+    length = 0
+    while length < size:
+        word = random.choice(WORDS)
+        text.append(word)
+        length += len(word) + 1
+    return " ".join(text)[:size]
+
+
+def create_app(latency_ms: float = 800, jitter_ms: float = 200, reply_bytes: int = 600) -> Starlette:
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+    async def webhook(request):
+        await request.body()
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+            await asyncio.sleep(delay)
+            return PlainTextResponse(reply_text(reply_bytes))
+        finally:
+            stats["in_flight"] -= 1
+
+    app = Starlette(routes=[Route("/{path:path}", webhook, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_n8n")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5679)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--reply-bytes", type=int, default=600)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.reply_bytes),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+End-to-end load test: boots app.main:app under uvicorn in this process, next to a fake
+n8n agent server (benchmarks.fake_n8n), seeds users, an agent and conversations, then
+drives each scenario and writes throughput, p50/p95/p99 latency and DB query counts to JSON.
+
+    cd backend
+    python -m benchmarks.load [--scenarios login,inbox,message,message_attachment,webhook_burst,mixed]
+        [--requests 200] [--concurrency 20] [--n8n-latency-ms 800] [--reply-bytes 600]
+        [--database-url postgresql://...] [--output load-results.json] [--baseline load-baseline.json]
+
+Without --database-url (or DATABASE_URL) a fresh SQLite file in the work directory is used.
+A Postgres database must already be migrated (alembic upgrade head); seeded rows are not removed.
+With --baseline the run is compared against an earlier results file and exits 1 on a regression.
+Set BCRYPT_ROUNDS, AGENT_REPLY_MODE etc. in the environment as for the app itself.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "load-test-password"
+SCENARIOS = ["login", "inbox", "message", "message_attachment", "webhook_burst", "mixed"]
+MIX = {"inbox": 60, "message": 25, "message_attachment": 5, "login": 5, "webhook_burst": 5}
+
+
+class QueryCounter:
+    """Counts statements sent to the database by every engine the app uses."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def attach(self, engine):
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self.lock:
+            self.count += 1
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def start_server(app, port: int):
+    """Runs uvicorn on its own thread and event loop, so the load generator does not share it."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(agent_link: str, users: int, conversations: int, messages: int) -> list:
+    """Creates the agent and `users` users with their conversation history; returns the users."""
+    from jose import jwt
+
+    from app.api.auth import SECRET_KEY, ALGORITHM
+    from app.core.password_hasher import password_hasher
+    from app.db.database import SessionLocal
+    from app.db.models import Agent, Conversation, Message, User
+
+    run = uuid4().hex[:8]
+    password_hash = password_hasher.hash_sync(PASSWORD)
+    db = SessionLocal()
+    try:
+        db.add(Agent(eleven_labs_id=f"load_{run}", link=agent_link, name="Load test agent", price=0, is_active=True))
+        rows = [
+            User(email=f"load_{run}_{i}@example.com", password_hash=password_hash, first_name="Load", last_name=str(i))
+            for i in range(users)
+        ]
+        db.add_all(rows)
+        db.flush()
+        seeded = []
+        for user in rows:
+            history = [Conversation(user_id=user.id) for _ in range(conversations)]
+            db.add_all(history)
+            db.flush()
+            db.add_all(
+                Message(conversation_id=conversation.id, is_systen=bool(k % 2), content=f"Seeded message {k}")
+                for conversation in history
+                for k in range(messages)
+            )
+            token = jwt.encode(
+                {"sub": user.email, "exp": datetime.utcnow() + timedelta(hours=24)}, SECRET_KEY, algorithm=ALGORITHM
+            )
+            seeded.append({
+                "id": user.id,
+                "email": user.email,
+                "headers": {"Authorization": f"Bearer {token}"},
+                "conversation_id": history[0].id if history else None,
+            })
+        db.commit()
+        return seeded
+    finally:
+        db.close()
+
+
+class Scenarios:
+    def __init__(self, client, agent_link: str, webhook_secret: str, attachment_bytes: int):
+        self.client = client
+        self.agent_link = agent_link
+        self.webhook_secret = webhook_secret
+        self.attachment_bytes = attachment_bytes
+
+    async def login(self, user):
+        return await self.client.post("/login", data={"username": user["email"], "password": PASSWORD})
+
+    async def inbox(self, user):
+        return await self.client.get(f"/users/{user['id']}/inbox", params={"limit": 20}, headers=user["headers"])
+
+    async def message(self, user, attachment: bool = False):
+        data = {"content": "Can you summarise my last call?", "link": self.agent_link}
+        if user["conversation_id"] is not None:
+            data["conversation_id"] = str(user["conversation_id"])
+        files = None
+        if attachment:
+            # Distinct bytes per upload, so every request stores a new blob
+            content = (uuid4().hex * (self.attachment_bytes // 32 + 1)).encode()[:self.attachment_bytes]
+            files = {"file": ("notes.txt", content, "text/plain")}
+        return await self.client.post("/messages", data=data, files=files, headers=user["headers"])
+
+    async def message_attachment(self, user):
+        return await self.message(user, attachment=True)
+
+    async def webhook_burst(self, user):
+        from benchmarks.elevenlabs_webhook import signed_request, transcript_payload
+
+        body, headers = signed_request(transcript_payload(user["id"], user["email"]), self.webhook_secret)
+        return await self.client.post("/webhook/eleven", content=body, headers=headers)
+
+    async def mixed(self, user):
+        name = random.choices(list(MIX), weights=list(MIX.values()))[0]
+        return await getattr(self, name)(user)
+
+
+async def run_scenario(scenarios: Scenarios, name: str, users: list, requests: int, concurrency: int, queries: QueryCounter) -> dict:
+    from app.agent_queue import agent_queue
+
+    request_fn = getattr(scenarios, name)
+    latencies = []
+    statuses = Counter()
+    issued = 0
+
+    async def worker(index: int):
+        nonlocal issued
+        while issued < requests:
+            user = users[issued % len(users)]
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await request_fn(user)
+                statuses[str(response.status_code)] += 1
+            except Exception as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    queries_before = queries.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # Queued agent replies finish in the background; count their queries here, not in the next scenario
+    while agent_queue.depth or agent_queue.running:
+        await asyncio.sleep(0.05)
+    total_queries = queries.count - queries_before
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_counts": dict(sorted(statuses.items())),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        },
+        "db_queries": {
+            "total": total_queries,
+            "per_request": round(total_queries / len(latencies), 2) if latencies else 0.0,
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints how each scenario moved against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\n{'scenario':<20}{'metric':<18}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        old_queries = before["db_queries"]["per_request"]
+        new_queries = now["db_queries"]["per_request"]
+        rows = [
+            # (metric, baseline, now, regressed); p50/p99 are shown but too noisy to gate on
+            ("throughput_rps", before["throughput_rps"], now["throughput_rps"],
+             now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance)),
+            ("p50_ms", before["latency_ms"]["p50"], now["latency_ms"]["p50"], False),
+            ("p95_ms", before["latency_ms"]["p95"], now["latency_ms"]["p95"],
+             now["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance)),
+            ("p99_ms", before["latency_ms"]["p99"], now["latency_ms"]["p99"], False),
+            # Cache warm-up makes the average drift slightly, a new query per request does not
+            ("queries/request", old_queries, new_queries, new_queries - old_queries >= 0.5),
+        ]
+        for metric, old, new, regressed in rows:
+            change = (new - old) / old if old else 0.0
+            print(f"{name:<20}{metric:<18}{old:>12}{new:>12}{change:>+10.1%}{'  !' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{name} {metric}: {old} -> {new}")
+    return regressions
+
+
+async def drive(args, app_users: list, agent_link: str, base_url: str, queries: QueryCounter) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.burst))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        scenarios = Scenarios(client, agent_link, os.environ["ELEVENLABS_WEBHOOK_SECRET"], args.attachment_bytes)
+        await scenarios.inbox(app_users[0])  # Warm up connections and caches
+        results = {}
+        for name in args.scenarios:
+            concurrency = args.burst if name == "webhook_burst" else args.concurrency
+            requests = args.burst * args.bursts if name == "webhook_burst" else args.requests
+            results[name] = await run_scenario(scenarios, name, app_users, requests, concurrency, queries)
+            summary = results[name]
+            print(
+                f"{name:<20}{summary['throughput_rps']:>9.1f} req/s  p50 {summary['latency_ms']['p50']:>8.1f} ms"
+                f"  p95 {summary['latency_ms']['p95']:>8.1f} ms  p99 {summary['latency_ms']['p99']:>8.1f} ms"
+                f"  {summary['db_queries']['per_request']:>6.1f} queries/req  {summary['errors']} errors",
+                file=sys.__stdout__,
+                flush=True,
+            )
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=50, help="Webhooks sent at once")
+    parser.add_argument("--bursts", type=int, default=4)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=30, help="Seeded conversations per user")
+    parser.add_argument("--messages", type=int, default=10, help="Seeded messages per conversation")
+    parser.add_argument("--attachment-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--n8n-latency-ms", type=float, default=800)
+    parser.add_argument("--n8n-jitter-ms", type=float, default=200)
+    parser.add_argument("--reply-bytes", type=int, default=600)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--workdir", default=None, help="Uploads, the SQLite file and app.log go here")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="load-results.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="friday-load-"))
+    os.makedirs(workdir, exist_ok=True)
+    sqlite = args.database_url is None
+    # The app reads its configuration at import time, so the environment is set up first
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    os.environ.setdefault("ELEVENLABS_WEBHOOK_SECRET", "load-test-secret")
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)  # The app writes uploads relative to the working directory
+    random.seed(args.seed)
+
+    from benchmarks.fake_n8n import create_app as create_fake_n8n
+    from app.main import app
+    from app.core.config import settings
+    from app.db import database
+
+    queries = QueryCounter()
+    for engine in (database.engine, database.async_engine.sync_engine, database.replica_engine):
+        if engine is not None:
+            queries.attach(engine)
+    if sqlite:
+        from app.db import models  # noqa: F401  Registers the tables
+
+        database.Base.metadata.create_all(database.engine)
+
+    print(f"Work directory: {workdir} (app output in app.log)")
+    app_log = open(os.path.join(workdir, "app.log"), "w")
+    sys.stdout = app_log  # The app print()s every message and webhook
+
+    n8n_server, n8n_thread = start_server(
+        create_fake_n8n(args.n8n_latency_ms, args.n8n_jitter_ms, args.reply_bytes), free_port()
+    )
+    agent_link = f"http://127.0.0.1:{n8n_server.config.port}/webhook/load"
+    app_users = seed(agent_link, args.users, args.conversations, args.messages)
+    app_server, app_thread = start_server(app, free_port())
+    try:
+        scenarios = asyncio.run(
+            drive(args, app_users, agent_link, f"http://127.0.0.1:{app_server.config.port}", queries)
+        )
+    finally:
+        for server, thread in ((app_server, app_thread), (n8n_server, n8n_thread)):
+            server.should_exit = True
+            thread.join(timeout=30)
+        sys.stdout = sys.__stdout__
+        app_log.close()
+
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "database": database.engine.dialect.name,
+            "python": platform.python_version(),
+            "reply_mode": settings.AGENT_REPLY_MODE,
+            "stream_replies": settings.AGENT_STREAM_REPLIES,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "n8n_latency_ms": args.n8n_latency_ms,
+            "n8n_jitter_ms": args.n8n_jitter_ms,
+            "reply_bytes": args.reply_bytes,
+            "attachment_bytes": args.attachment_bytes,
+            "users": args.users,
+            "seeded_conversations": args.users * args.conversations,
+            "seeded_messages": args.users * args.conversations * args.messages,
+        },
+        "scenarios": scenarios,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Serialisation time and bytes on the wire for our larger response models:
+FastAPI's default JSONResponse vs the ORJSONResponse default (both after pydantic's
+model_dump, as for routes with a response_model), then gzip / brotli sizes.
+
+    cd backend
+    python -m benchmarks.serialization [--iterations 200]
+"""
+import argparse
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core.compression import brotli
+from app.core.config import settings
+from app.schemas.conversation import Conversation
+from app.schemas.subscription import SubscriptionWithPayments
+from app.schemas.user import User
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def conversation(messages: int) -> Conversation:
+    return Conversation(
+        id=1,
+        user_id=7,
+        created_at=NOW,
+        messages=[
+            {
+                "id": i,
+                "conversation_id": 1,
+                "is_systen": bool(i % 2),
+                "content": f"Message {i}: " + "the quick brown fox jumps over the lazy dog " * 4,
+                "sent_at": NOW + timedelta(seconds=i),
+                "conversation": {"id": 1, "user_id": 7, "created_at": NOW},
+            }
+            for i in range(messages)
+        ],
+    )
+
+
+def subscription(agents: int, payments: int) -> SubscriptionWithPayments:
+    return SubscriptionWithPayments(
+        id=1,
+        user_id=7,
+        plan_id=2,
+        started_at=NOW,
+        created_at=NOW,
+        updated_at=NOW,
+        status="active",
+        agents=[
+            {
+                "id": i,
+                "eleven_labs_id": f"agent_{i:04d}",
+                "link": f"https://n8n.example.com/webhook/{i}",
+                "name": f"Agent {i}",
+                "price": 19.99,
+                "description": "Answers calls and books appointments for small businesses.",
+                "feature_list": ["Voice", "Calendar", "CRM sync"],
+                "is_active": True,
+                "created_at": NOW,
+                "updated_at": NOW,
+            }
+            for i in range(agents)
+        ],
+        payments=[
+            {
+                "id": i,
+                "user_id": 7,
+                "subscription_id": 1,
+                "payment_type": "credit_card",
+                "currency": "usd",
+                "amount": 49.0,
+                "transaction_id": f"txn_{i:08d}",
+                "paid_at": NOW,
+                "created_at": NOW,
+            }
+            for i in range(payments)
+        ],
+    )
+
+
+def users(count: int) -> list:
+    return [
+        User(
+            id=i,
+            email=f"user{i}@example.com",
+            first_name="Ada",
+            last_name="Lovelace",
+            phone_number="+15550100",
+            bio="Runs a small bakery.",
+            created_at=NOW,
+            updated_at=NOW,
+        )
+        for i in range(count)
+    ]
+
+
+def dumped(content):
+    # What FastAPI hands the response class for a route with a response_model
+    if isinstance(content, list):
+        return [item.model_dump(mode="json") for item in content]
+    return content.model_dump(mode="json")
+
+
+def default_render(content) -> bytes:
+    return JSONResponse(dumped(content)).body
+
+
+def orjson_render(content) -> bytes:
+    return ORJSONResponse(dumped(content)).body
+
+
+def untyped_render(content) -> bytes:
+    # Routes without a response_model go through jsonable_encoder first
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def per_call_ms(fn, content, iterations: int) -> float:
+    fn(content)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(content)
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def compressed(body: bytes, encoding: str):
+    started = time.perf_counter()
+    if encoding == "br":
+        data = brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    else:
+        compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(body) + compressor.flush()
+    return len(data), (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        ("Conversation, 200 messages", conversation(200)),
+        ("SubscriptionWithPayments, 20 agents / 50 payments", subscription(20, 50)),
+        ("User list, 500 users", users(500)),
+    ]
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    for name, content in cases:
+        untyped_ms = per_call_ms(untyped_render, content, args.iterations)
+        default_ms = per_call_ms(default_render, content, args.iterations)
+        orjson_ms = per_call_ms(orjson_render, content, args.iterations)
+        body = orjson_render(content)
+        print(name)
+        print(f"  jsonable_encoder + JSONResponse {untyped_ms:8.3f} ms")
+        print(f"  JSONResponse   {default_ms:8.3f} ms   {len(default_render(content)):>9,} bytes")
+        print(f"  ORJSONResponse {orjson_ms:8.3f} ms   {len(body):>9,} bytes  ({default_ms / orjson_ms:.1f}x faster)")
+        for encoding in encodings:
+            size, ms = compressed(body, encoding)
+            print(f"  + {encoding:<12} {ms:8.3f} ms   {size:>9,} bytes  ({size / len(body):.0%} of identity)")
+    if brotli is None:
+        print("(brotli not installed, br skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Database fixtures. The tests run against a PostgreSQL database they are free to wipe,
+named by TEST_DATABASE_URL:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/friday_test python -m pytest
+
+Without it the tests that need the database are skipped.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple
+from uuid import uuid4
+
+import pytest
+from jose import jwt
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Before app.db.database builds its engines from the environment
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+from app.db.models import Agent, Conversation, Message, Payment, Plan, Subscription, SubscriptionStatus, User
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = (2, 20)
+BACKGROUND_USERS = 2000
+
+# Other users' rows, so the tables are big enough for the planner to pick the plans
+# it picks in production: on a few hundred rows it walks whole indexes instead.
+BACKGROUND = [
+    "INSERT INTO users (type, email, password_hash, is_active)"
+    " SELECT 'user', 'background-' || g || '@example.com', '-', true FROM generate_series(1, :users) g",
+    "INSERT INTO plans (name, description, max_agents) VALUES ('background', 'Test data', 2)",
+    "INSERT INTO agents (eleven_labs_id, name, price, link)"
+    " SELECT 'background-' || g, 'Agent ' || g, 0, 'https://example.com/background/' || g FROM generate_series(1, 100) g",
+    "INSERT INTO conversations (user_id, created_at)"
+    " SELECT users.id, now() - g * interval '1 hour' FROM users, generate_series(1, 10) g"
+    " WHERE users.email LIKE 'background-%'",
+    "INSERT INTO messages (conversation_id, content, is_systen)"
+    " SELECT conversations.id, 'Message ' || g, g % 2 = 0 FROM conversations, generate_series(1, 10) g",
+    "INSERT INTO subscriptions (user_id, plan_id, status)"
+    " SELECT users.id, plans.id, CAST(CASE WHEN g = 1 THEN 'active' ELSE 'expired' END AS subscriptionstatus)"
+    " FROM users, plans, generate_series(1, 4) g WHERE users.email LIKE 'background-%' AND plans.name = 'background'",
+    "INSERT INTO subscription_agents (subscription_id, agent_id)"
+    " SELECT subscriptions.id, agents.id FROM subscriptions JOIN agents ON agents.id % 50 = subscriptions.id % 50",
+    "INSERT INTO payments (user_id, subscription_id, payment_type, currency, amount, transaction_id)"
+    " SELECT user_id, id, 'credit_card', 'usd', 10, 'background-' || id || '-' || g FROM subscriptions, generate_series(1, 3) g",
+]
+
+class Seeded(NamedTuple):
+    user_id: int
+    email: str
+    conversation_id: int
+    subscription_id: int
+
+def alembic_config(url: str = TEST_DATABASE_URL) -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    return config
+
+def seed(db: Session, rows: int) -> Seeded:
+    """One user with `rows` conversations of `rows` messages and `rows` subscriptions of `rows` agents and payments."""
+    tag = uuid4().hex[:12]
+    user = User(email=f"seed-{tag}@example.com", password_hash="-")
+    plan = Plan(name=f"seed-{tag}", description="Test data", max_agents=rows)
+    agents = [
+        Agent(eleven_labs_id=f"seed-{tag}-{i}", name=f"Agent {i}", price=0, link=f"https://example.com/{tag}/{i}")
+        for i in range(rows)
+    ]
+    db.add_all([user, plan, *agents])
+    db.flush()
+
+    conversations = [Conversation(user_id=user.id) for _ in range(rows)]
+    db.add_all(conversations)
+    db.flush()
+    db.add_all(
+        Message(conversation_id=conversation.id, content=f"Message {i}", is_systen=bool(i % 2))
+        for conversation in conversations
+        for i in range(rows)
+    )
+
+    subscriptions = [
+        Subscription(
+            user_id=user.id,
+            plan_id=plan.id,
+            status=SubscriptionStatus.active if i == 0 else SubscriptionStatus.expired,
+            agents=agents,
+        )
+        for i in range(rows)
+    ]
+    db.add_all(subscriptions)
+    db.flush()
+    db.add_all(
+        Payment(
+            user_id=user.id,
+            subscription_id=subscription.id,
+            payment_type="credit_card",
+            currency="usd",
+            amount=10,
+            transaction_id=f"seed-{tag}-{subscription.id}-{i}",
+        )
+        for subscription in subscriptions
+        for i in range(rows)
+    )
+    db.commit()
+    return Seeded(user.id, user.email, conversations[0].id, subscriptions[0].id)
+
+@pytest.fixture(scope="session")
+def database():
+    """The app's own engine, on an emptied TEST_DATABASE_URL migrated to head."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.core import query_counter
+    from app.db.database import async_engine, engine
+
+    if engine.dialect.name != "postgresql":
+        pytest.skip("TEST_DATABASE_URL must be a PostgreSQL database")
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    command.upgrade(alembic_config(), "head")
+    # Makes the app's statements visible to query_budget(), for this test run only
+    query_counter.attach(engine)
+    query_counter.attach(async_engine.sync_engine)
+    yield engine
+    engine.dispose()
+
+class Scratch(NamedTuple):
+    engine: Engine
+    migrations: Config
+
+@pytest.fixture
+def scratch(database):
+    """
+    A database of its own, migrated to head and dropped afterwards, for tests that move
+    between revisions: the shared test database stays at head whatever order tests run in.
+    """
+    url = make_url(TEST_DATABASE_URL)
+    name = f"{url.database}_scratch"
+    with database.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    scratch_url = url.set(database=name).render_as_string(hide_password=False)
+    engine = create_engine(scratch_url)
+    migrations = alembic_config(scratch_url)
+    command.upgrade(migrations, "head")
+    try:
+        yield Scratch(engine, migrations)
+    finally:
+        engine.dispose()
+        with database.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+
+@pytest.fixture(scope="session")
+def seeded(database) -> Dict[int, Seeded]:
+    """A user per size in SIZES among BACKGROUND_USERS others, committed, with fresh planner statistics."""
+    with database.begin() as conn:
+        for statement in BACKGROUND:
+            conn.execute(text(statement), {"users": BACKGROUND_USERS})
+    with Session(database) as db:
+        users = {rows: seed(db, rows) for rows in SIZES}
+    with database.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("ANALYZE")
+    return users
+
+@pytest.fixture(scope="session")
+def admin(database) -> Seeded:
+    with Session(database) as db:
+        user = User(email=f"admin-{uuid4().hex[:12]}@example.com", password_hash="-", type="admin")
+        db.add(user)
+        db.commit()
+        return Seeded(user.id, user.email, 0, 0)
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+def auth_headers(user: Seeded) -> dict:
+    """A bearer token as POST /login issues it."""
+    from app.api.auth import ALGORITHM, SECRET_KEY
+
+    token = jwt.encode({"sub": user.email, "exp": datetime.utcnow() + timedelta(hours=1)}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,43 @@
+import os
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.models import FileBlob, User
+from app.services.blob_service import BlobService, blob_path
+
+def stored(db: Session, fill: str, ref_count: int, references: int) -> str:
+    """An old blob with its file, a recorded ref_count and `references` users pointing at it."""
+    path = blob_path(fill * 64, ".png")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(fill.encode())
+    db.add(FileBlob(sha256=fill * 64, path=path, size=1, ref_count=ref_count))
+    db.add_all(User(email=f"blob-{fill}-{i}@example.com", password_hash="-", profile_picture_path=path) for i in range(references))
+    db.flush()
+    db.execute(text("UPDATE file_blobs SET created_at = now() - interval '1 day' WHERE sha256 = :sha256"), {"sha256": fill * 64})
+    db.commit()
+    return path
+
+def test_gc_corrects_ref_counts_and_deletes_only_unreferenced_blobs(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with Session(database) as db:
+        kept = stored(db, "a", ref_count=1, references=1)
+        undercounted = stored(db, "b", ref_count=0, references=2)
+        overcounted = stored(db, "c", ref_count=3, references=0)
+        unreferenced = stored(db, "d", ref_count=0, references=0)
+        try:
+            blobs = BlobService(db)
+            assert sorted(blobs.check_ref_counts(dry_run=True)) == [(undercounted, 0, 2), (overcounted, 3, 0)]
+            assert blobs.collect_garbage(grace_seconds=0, dry_run=True) == [unreferenced]
+            assert all(os.path.exists(path) for path in (kept, undercounted, overcounted, unreferenced))
+
+            assert sorted(blobs.check_ref_counts()) == [(undercounted, 0, 2), (overcounted, 3, 0)]
+            assert sorted(blobs.collect_garbage(grace_seconds=0)) == [overcounted, unreferenced]
+            assert {blob.path: blob.ref_count for blob in db.query(FileBlob)} == {kept: 1, undercounted: 2}
+            assert os.path.exists(kept) and os.path.exists(undercounted)
+        finally:
+            db.rollback()
+            db.execute(text("DELETE FROM users WHERE email LIKE 'blob-%'"))
+            db.execute(text("DELETE FROM file_blobs"))
+            db.commit()
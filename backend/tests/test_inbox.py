@@ -0,0 +1,23 @@
+import pytest
+
+from tests.conftest import auth_headers
+
+@pytest.mark.parametrize("cursor", [
+    {"before_id": 1},
+    {"before_activity": "2026-01-01T00:00:00+00:00"},
+])
+def test_inbox_rejects_half_a_cursor(client, seeded, cursor):
+    user = seeded[2]
+    response = client.get(f"/users/{user.user_id}/inbox", params=cursor, headers=auth_headers(user))
+    assert response.status_code == 422, response.text
+
+def test_inbox_pages_with_the_full_cursor(client, seeded):
+    user = seeded[20]
+    url, headers = f"/users/{user.user_id}/inbox", auth_headers(user)
+    first = client.get(url, params={"limit": 15}, headers=headers).json()
+    last = first[-1]
+    second = client.get(
+        url, params={"limit": 15, "before_activity": last["last_activity_at"], "before_id": last["id"]}, headers=headers
+    ).json()
+    assert len(first) == 15 and len(second) == 5
+    assert not {row["id"] for row in first} & {row["id"] for row in second}
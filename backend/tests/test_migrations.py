@@ -0,0 +1,13 @@
+from alembic import command
+from sqlalchemy import text
+
+def test_service_indexes_rebuild_an_invalid_index(scratch):
+    """A CREATE INDEX CONCURRENTLY that failed leaves an INVALID index; rerunning the migration replaces it."""
+    command.downgrade(scratch.migrations, "a46cd22a2de6")
+    with scratch.engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_agents_link ON agents (link)"))
+        conn.execute(text("UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_agents_link'::regclass"))
+    command.upgrade(scratch.migrations, "head")
+    with scratch.engine.connect() as conn:
+        valid = conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_agents_link'::regclass")).scalar()
+    assert valid is True
@@ -0,0 +1,50 @@
+"""
+Query budgets: each per-user endpoint is requested through the app, routing, auth and
+serialisation included, for a user with 2 and with 20 rows of everything, inside
+query_budget(). Going over the budget fails with the statements listed, where an N+1
+shows as one statement run 20x; so does a count that grows with the number of rows.
+
+The budgets are for a warm principal cache, as for every request but the first
+in PRINCIPAL_CACHE_TTL; a cold one adds the user lookup.
+"""
+import pytest
+
+from app.core.query_counter import format_statements, query_budget
+from tests.conftest import SIZES, auth_headers
+
+# (path, budget, admin): statements per request, whatever the number of rows
+ENDPOINT_BUDGETS = [
+    ("/users/{user_id}/inbox", 1, False),
+    ("/users/{user_id}/conversations", 2, False),
+    ("/users/{user_id}/conversations/{conversation_id}", 2, False),
+    # 3: the Message schema's `conversation` is loaded again once, after the ownership check's copy is gone
+    ("/conversations/{conversation_id}/messages", 3, False),
+    ("/users/{user_id}/subscriptions", 2, False),
+    ("/users/{user_id}/subscriptions/active", 2, False),
+    ("/subscriptions/{subscription_id}", 3, False),
+    ("/users/{user_id}/payments", 1, False),
+    ("/subscriptions/{subscription_id}/payments", 2, False),
+    ("/subscriptions", 2, True),
+    ("/subscriptions/active", 2, True),
+    ("/conversations", 2, True),
+]
+
+@pytest.mark.parametrize("path, budget, as_admin", ENDPOINT_BUDGETS, ids=[path for path, _, _ in ENDPOINT_BUDGETS])
+def test_endpoint_stays_within_its_query_budget(client, seeded, admin, path, budget, as_admin):
+    counts = {}
+    for rows in SIZES:
+        user = seeded[rows]
+        url = path.format(**user._asdict())
+        headers = auth_headers(admin if as_admin else user)
+        assert client.get(url, headers=headers).status_code == 200  # Warms the principal cache
+
+        with query_budget(budget, name=f"GET {url} ({rows} rows)") as counted:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+        counts[rows] = counted
+
+    smallest, largest = (counts[rows] for rows in (min(SIZES), max(SIZES)))
+    assert smallest.count == largest.count, (
+        f"GET {path}: {smallest.count} queries at {min(SIZES)} rows, {largest.count} at {max(SIZES)}\n"
+        + format_statements(largest.statements)
+    )
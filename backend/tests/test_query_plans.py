@@ -0,0 +1,99 @@
+"""
+EXPLAINs every statement the per-user service reads issue against the seeded database.
+enable_seqscan is off, so a Seq Scan means the planner had no index to use; an index
+scan without an Index Cond walks the whole index, which is no better.
+Admin "list everything" reads are left out, a full scan is the right plan for those.
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.services.agent_service import AgentService
+from app.services.blob_service import BlobService
+from app.services.conversation_service import ConversationService
+from app.services.message_service import MessageService
+from app.services.payment_service import PaymentService
+from app.services.subscription_service import SubscriptionService
+from app.services.user_service import UserService
+
+SERVICE_READS = [
+    ("UserService.get_user_by_email", lambda db, s: UserService(db).get_user_by_email(s.email)),
+    ("AgentService.get_agent_by_link", lambda db, s: AgentService(db).get_agent_by_link("https://example.com/webhook")),
+    ("ConversationService.get_conversations_by_user", lambda db, s: ConversationService(db).get_conversations_by_user(s.user_id)),
+    ("ConversationService.get_inbox", lambda db, s: ConversationService(db).get_inbox(s.user_id)),
+    ("MessageService.get_messages_by_conversation",
+     lambda db, s: MessageService(db).get_messages_by_conversation(s.conversation_id, limit=50)),
+    ("MessageService.get_messages_by_conversation(before)",
+     lambda db, s: MessageService(db).get_messages_by_conversation(s.conversation_id, before=1000, limit=50)),
+    ("SubscriptionService.get_subscriptions_by_user", lambda db, s: SubscriptionService(db).get_subscriptions_by_user(s.user_id)),
+    ("SubscriptionService.get_active_subscriptions_by_user",
+     lambda db, s: SubscriptionService(db).get_active_subscriptions_by_user(s.user_id)),
+    ("SubscriptionService.get_subscription_with_payments",
+     lambda db, s: SubscriptionService(db).get_subscription_with_payments(s.subscription_id)),
+    ("PaymentService.get_payments_by_user", lambda db, s: PaymentService(db).get_payments_by_user(s.user_id, limit=50)),
+    ("PaymentService.get_payments_by_subscription",
+     lambda db, s: PaymentService(db).get_payments_by_subscription(s.subscription_id, limit=50)),
+    ("BlobService.get_blob", lambda db, s: BlobService(db).get_blob("0" * 64)),
+]
+
+def capture_selects(conn, read):
+    statements = []
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", before_cursor_execute)
+    try:
+        with Session(bind=conn) as db:
+            read(db)
+    finally:
+        event.remove(conn, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+# Reads that must go through a given index, whether or not its table is a catalog
+EXPECTED_INDEXES = {
+    "AgentService.get_agent_by_link": "ix_agents_link",
+}
+
+# The agent and plan catalogs stay small; joining them in whole is the cheap plan
+CATALOG_TABLES = {"agents", "plans"}
+
+def full_scans(node: dict) -> list:
+    """Scan nodes that read a whole table or a whole index, outside the catalog tables."""
+    found = []
+    if node.get("Relation Name") in CATALOG_TABLES:
+        pass
+    elif node["Node Type"] == "Seq Scan":
+        found.append(f"Seq Scan on {node['Relation Name']}")
+    elif node["Node Type"] in ("Index Scan", "Index Only Scan", "Bitmap Index Scan") and "Index Cond" not in node:
+        found.append(f"{node['Node Type']} using {node['Index Name']} without an Index Cond")
+    for child in node.get("Plans", []):
+        found.extend(full_scans(child))
+    return found
+
+def indexes_used(node: dict) -> set:
+    used = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        used |= indexes_used(child)
+    return used
+
+@pytest.mark.parametrize("name, read", SERVICE_READS, ids=[name for name, _ in SERVICE_READS])
+def test_service_read_uses_an_index(database, seeded, name, read):
+    with database.connect() as conn:
+        transaction = conn.begin()
+        try:
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            statements = capture_selects(conn, lambda db: read(db, seeded[20]))
+            assert statements, f"{name} ran no SELECT"
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+                text_plan = [row[0] for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters)]
+                scans = full_scans(plan)
+                assert not scans, f"{name}: {', '.join(scans)}\n{' '.join(statement.split())}\n" + "\n".join(text_plan)
+                if name in EXPECTED_INDEXES:
+                    assert EXPECTED_INDEXES[name] in indexes_used(plan), (
+                        f"{name}: does not use {EXPECTED_INDEXES[name]}\n" + "\n".join(text_plan)
+                    )
+        finally:
+            transaction.rollback()